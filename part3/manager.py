@@ -3,6 +3,7 @@ import json
 import os
 import sys
 
+from transaction_state import TransactionRecord, TxState
 
 LOG_FILE = "transaction_log.json"
 
@@ -15,7 +16,7 @@ class TransactionManager:
         self.host = host
         self.port = port
         self.server = None
-        self.log = self.load_log()
+        self.txn = self.load_log()
 
     def load_log(self):
         """
@@ -23,36 +24,30 @@ class TransactionManager:
         """
         if os.path.exists(LOG_FILE):
             with open(LOG_FILE, "r") as file:
-                log = json.load(file)
-            # Ensure required keys are present in the log
-            if "clients" not in log:
-                log["clients"] = {}
-            if "decision" not in log:
-                log["decision"] = None
-            return log
+                return TransactionRecord.from_log(json.load(file))
         else:
             # Create a new log if no file exists
-            return {"clients": {}, "decision": None}
+            return TransactionRecord()
 
     def save_log(self):
         """
         Save the current transaction log to file.
         """
         with open(LOG_FILE, "w") as file:
-            json.dump(self.log, file)
+            json.dump(self.txn.to_log(), file)
 
-    def log_client_status(self, client_id, status):
+    def log_client_status(self, client_id, state):
         """
-        Update the status of a client in the transaction log.
+        Update the state of a client in the transaction log.
         """
-        self.log["clients"][client_id] = status
+        self.txn.set_state(client_id, state)
         self.save_log()
 
     def log_decision(self, decision):
         """
         Record the final transaction decision in the log.
         """
-        self.log["decision"] = decision
+        self.txn.decision = decision
         self.save_log()
 
     def recover_and_continue(self):
@@ -62,16 +57,12 @@ class TransactionManager:
         print("[Manager] Recovering from crash...")
 
         # Verify the decision is available for recovery
-        if not self.log["decision"]:
+        if not self.txn.decision:
             print("[Manager] Error: Decision is missing from the log. Recovery cannot proceed.")
             return
 
         # Identify clients that haven't received the decision
-        remaining_clients = [
-            client_id
-            for client_id, status in self.log["clients"].items()
-            if "sent" not in status
-        ]
+        remaining_clients = self.txn.pending_participants()
 
         print(f"[Manager] Waiting for {len(remaining_clients)} clients to reconnect...")
 
@@ -85,9 +76,10 @@ class TransactionManager:
         # Send the decision to reconnected clients
         for client_id, client_socket in reconnected_clients.items():
             try:
-                client_socket.sendall(self.log["decision"].encode())
-                print(f"[Manager] Sent '{self.log['decision']}' to {client_id}")
-                self.log_client_status(client_id, f"{self.log['decision']}_sent")
+                client_socket.sendall(self.txn.decision.encode())
+                print(f"[Manager] Sent '{self.txn.decision}' to {client_id}")
+                self.txn.mark_sent(client_id)
+                self.save_log()
             except Exception as e:
                 print(f"[Manager] Error sending decision to {client_id}: {e}")
             finally:
@@ -104,28 +96,29 @@ class TransactionManager:
         self.server.listen(5)
 
         # Begin transaction coordination
-        if not self.log["clients"]:  # Accept new connections if not recovering
+        if not self.txn.participants:  # Accept new connections if not recovering
             print("[Manager] Waiting for clients to connect...")
             for i in range(2):  # Adjust this range for more clients
                 client_socket, addr = self.server.accept()
                 print(f"[Manager] Client {i + 1} connected from {addr}")
-                self.log_client_status(f"{addr[0]}:{addr[1]}", "connected")
+                self.log_client_status(f"{addr[0]}:{addr[1]}", TxState.CONNECTED)
             print("[Manager] All clients connected.")
 
             # Simulate the prepare phase
-            for client_id in list(self.log["clients"].keys()):
-                self.log_client_status(client_id, "prepared")
+            for client_id in list(self.txn.participants):
+                self.log_client_status(client_id, TxState.PREPARED)
 
             # Make a decision
             self.log_decision("commit")
 
             # Send the decision to the first client
-            first_client = list(self.log["clients"].keys())[0]
+            first_client = self.txn.participants[0]
             first_client_socket, addr = self.server.accept()
             try:
-                first_client_socket.sendall(self.log["decision"].encode())
-                print(f"[Manager] Sent '{self.log['decision']}' to {first_client}")
-                self.log_client_status(first_client, f"{self.log['decision']}_sent")
+                first_client_socket.sendall(self.txn.decision.encode())
+                print(f"[Manager] Sent '{self.txn.decision}' to {first_client}")
+                self.txn.mark_sent(first_client)
+                self.save_log()
             except Exception as e:
                 print(f"[Manager] Error sending decision to {first_client}: {e}")
             finally:
@@ -0,0 +1,269 @@
+import argparse
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from coordinator import CoordinatorService
+from paxos_commit import Acceptor
+from participant import ParticipantService
+from protocol import send_message
+from transaction_state import TransactionRecord, TxState
+from txn_client import TransactionClient
+from txn_log import TransactionLog
+
+
+def measure_memory(build, count):
+    """
+    Return the bytes allocated per transaction by build(i) for `count` transactions.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(table)
+
+
+def benchmark_state(count, participants):
+    """
+    Compare the memory used by the dict-of-strings log layout and TransactionRecord.
+    """
+    ids = [f"127.0.0.1:{6000 + i}" for i in range(participants)]
+
+    def dict_layout(i):
+        return {"clients": {client_id: "prepared" for client_id in ids}, "decision": None}
+
+    def record_layout(i):
+        return TransactionRecord(ids)
+
+    print(f"[Benchmark] {count} live transactions, {participants} participants each")
+    for name, build in (("dict of strings", dict_layout), ("TransactionRecord", record_layout)):
+        print(f"[Benchmark] {name:>18}: {measure_memory(build, count):8.1f} bytes/transaction")
+
+    # Time the two queries the coordinator runs on every transaction
+    record = record_layout(0)
+    for client_id in ids:
+        record.set_state(client_id, TxState.PREPARED)
+    rounds = 1_000_000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        record.all_prepared()
+        record.pending
+    elapsed = time.perf_counter() - start
+    print(f"[Benchmark] all_prepared + pending check: {elapsed / rounds * 1e9:.0f} ns")
+
+
+def start_cluster(participants, fsync, acceptors=0):
+    """
+    Start a coordinator, participant services and (for Paxos Commit) acceptors
+    in this process, in a scratch directory.
+    """
+    os.chdir(tempfile.mkdtemp(prefix="2pc-bench-"))
+    acceptor_servers = [Acceptor(i, port=0, fsync=fsync) for i in range(acceptors)]
+    for acceptor in acceptor_servers:
+        acceptor.start()
+    addresses = [("127.0.0.1", acceptor.port) for acceptor in acceptor_servers] or None
+    coordinator = CoordinatorService(port=0, acceptors=addresses)
+    coordinator.start()
+    services = [
+        ParticipantService(i, port=coordinator.port, fsync=fsync, acceptors=addresses)
+        for i in range(1, participants + 1)
+    ]
+    for service in services:
+        threading.Thread(target=service.run, daemon=True).start()
+    while len(coordinator.participants) < participants:
+        time.sleep(0.01)
+    return coordinator, services, acceptor_servers
+
+
+def stop_cluster(coordinator, services, acceptor_servers):
+    """
+    Stop everything started by start_cluster.
+    """
+    for service in services:
+        service.stop()
+    coordinator.shutdown()
+    for acceptor in acceptor_servers:
+        acceptor.shutdown()
+
+
+def run_transactions(client, participant_ids, count, window):
+    """
+    Submit `count` transactions with at most `window` outstanding.
+    Returns (elapsed seconds, per-transaction latencies, decisions).
+    """
+    latencies = []
+    decisions = []
+    slots = threading.Semaphore(window)
+    done = threading.Event()
+
+    def finished(future, started):
+        latencies.append(time.perf_counter() - started)
+        decisions.append(future.result())
+        slots.release()
+        if len(decisions) == count:
+            done.set()
+
+    start = time.perf_counter()
+    for _ in range(count):
+        slots.acquire()
+        started = time.perf_counter()
+        client.begin(participant_ids).add_done_callback(lambda future, started=started: finished(future, started))
+    done.wait()
+    return time.perf_counter() - start, latencies, decisions
+
+
+def report(name, elapsed, latencies, decisions):
+    """
+    Print throughput and latency percentiles for one run.
+    """
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"[Benchmark] {name}: {len(latencies) / elapsed:8.0f} tx/s, "
+          f"median {statistics.median(latencies) * 1000:6.2f} ms, p99 {p99 * 1000:6.2f} ms, "
+          f"{decisions.count('commit')} commits")
+
+
+def benchmark_commit(count, participants, window, pool_size, fsync, acceptors=0):
+    """
+    Measure commit throughput and latency through the application client API.
+    """
+    cluster = start_cluster(participants, fsync, acceptors)
+    coordinator, services, _ = cluster
+    participant_ids = [service.participant_id for service in services]
+    mode = f"Paxos Commit, {acceptors} acceptors" if acceptors else "classic 2PC"
+    print(f"[Benchmark] {mode}: {count} transactions, {participants} participants, "
+          f"window {window}, pool {pool_size}, fsync {fsync}")
+    with TransactionClient(port=coordinator.port, pool_size=pool_size) as client:
+        report("sequential", *run_transactions(client, participant_ids, min(count, 1000), 1))
+        report("pipelined ", *run_transactions(client, participant_ids, count, window))
+    stop_cluster(*cluster)
+
+
+def benchmark_paxos(count, participants, window, pool_size, fsync, acceptors):
+    """
+    Run the commit benchmark for classic 2PC and for Paxos Commit on the same harness.
+    """
+    benchmark_commit(count, participants, window, pool_size, fsync)
+    benchmark_commit(count, participants, window, pool_size, fsync, acceptors)
+
+
+def benchmark_detection(rounds, heartbeat_interval):
+    """
+    Measure how long a transaction takes to abort when one participant hangs after joining.
+    """
+    cluster = start_cluster(1, fsync=False)
+    coordinator, services, _ = cluster
+    coordinator.heartbeat_interval = heartbeat_interval
+    print(f"[Benchmark] Hung participant detection, heartbeat every {heartbeat_interval * 1000:.0f} ms, "
+          f"vote timeout {coordinator.vote_timeout} s")
+    latencies = []
+    with TransactionClient(port=coordinator.port) as client:
+        for i in range(rounds):
+            # A participant that joins, then never reads, votes or sends heartbeats again
+            hung = socket.create_connection(("127.0.0.1", coordinator.port))
+            send_message(hung, {"type": "hello", "role": "participant", "id": f"hung-{i}"})
+            while f"hung-{i}" not in coordinator.participants:
+                time.sleep(0.001)
+            start = time.perf_counter()
+            decision = client.begin([services[0].participant_id, f"hung-{i}"]).result()
+            latencies.append(time.perf_counter() - start)
+            assert decision == "abort"
+            hung.close()
+    print(f"[Benchmark] abort after {statistics.median(latencies) * 1000:.1f} ms median, "
+          f"{max(latencies) * 1000:.1f} ms max")
+    stop_cluster(*cluster)
+
+
+def write_log(path, count, in_doubt_every):
+    """
+    Write a coordinator log of `count` committed transactions, leaving every
+    `in_doubt_every`-th one unacknowledged. The log is not closed, as after a crash.
+    """
+    log = TransactionLog(path)
+    log.recover()
+    for i in range(count):
+        txid = f"1.{i}"
+        log.append({"clients": {"1": "prepared", "2": "prepared"}, "decision": "commit", "txid": txid})
+        if i % in_doubt_every:
+            log.append({"txid": txid, "done": True})
+    log.file.close()
+
+
+def time_restart(path):
+    """
+    Return (seconds until the coordinator is listening, transactions recovered).
+    """
+    start = time.perf_counter()
+    coordinator = CoordinatorService(port=0, log_file=path)
+    coordinator.start()
+    elapsed = time.perf_counter() - start
+    recovered = len(coordinator.transactions)
+    coordinator.running = False
+    coordinator.server.close()
+    coordinator.log.file.close()  # Leave the index as the crash left it
+    return elapsed, recovered
+
+
+def benchmark_restart(sizes, in_doubt_every):
+    """
+    Compare coordinator restart time with the sidecar index against a full log replay.
+    """
+    os.chdir(tempfile.mkdtemp(prefix="2pc-bench-"))
+    for count in sizes:
+        path = f"log_{count}.jsonl"
+        write_log(path, count, in_doubt_every)
+        megabytes = os.path.getsize(path) / 1e6
+        indexed, recovered = time_restart(path)
+        os.remove(path + ".idx")
+        full, _ = time_restart(path)
+        print(f"[Benchmark] {count:>8} transactions ({megabytes:6.1f} MB, {recovered} in doubt): "
+              f"indexed {indexed * 1000:7.1f} ms, full replay {full * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the Part 4 transaction manager.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    state_parser = subparsers.add_parser("state", help="Memory per live transaction")
+    state_parser.add_argument("--count", type=int, default=200_000)
+    state_parser.add_argument("--participants", type=int, default=2)
+
+    commit_parser = subparsers.add_parser("commit", help="Commit throughput through the client API")
+    commit_parser.add_argument("--count", type=int, default=5000)
+    commit_parser.add_argument("--participants", type=int, default=2)
+    commit_parser.add_argument("--window", type=int, default=64, help="Outstanding transactions")
+    commit_parser.add_argument("--pool", type=int, default=1, help="Pooled connections")
+    commit_parser.add_argument("--no-fsync", dest="fsync", action="store_false")
+
+    paxos_parser = subparsers.add_parser("paxos", help="Classic 2PC against Paxos Commit")
+    paxos_parser.add_argument("--count", type=int, default=3000)
+    paxos_parser.add_argument("--participants", type=int, default=2)
+    paxos_parser.add_argument("--acceptors", type=int, default=3)
+    paxos_parser.add_argument("--window", type=int, default=64, help="Outstanding transactions")
+    paxos_parser.add_argument("--pool", type=int, default=1, help="Pooled connections")
+    paxos_parser.add_argument("--no-fsync", dest="fsync", action="store_false")
+
+    detect_parser = subparsers.add_parser("detect", help="Failure detection latency for a hung participant")
+    detect_parser.add_argument("--rounds", type=int, default=10)
+    detect_parser.add_argument("--interval", type=float, default=0.02, help="Heartbeat interval in seconds")
+
+    restart_parser = subparsers.add_parser("restart", help="Coordinator restart time against log size")
+    restart_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    restart_parser.add_argument("--in-doubt-every", type=int, default=1000)
+
+    args = parser.parse_args()
+    if args.command == "state":
+        benchmark_state(args.count, args.participants)
+    elif args.command == "commit":
+        benchmark_commit(args.count, args.participants, args.window, args.pool, args.fsync)
+    elif args.command == "paxos":
+        benchmark_paxos(args.count, args.participants, args.window, args.pool, args.fsync, args.acceptors)
+    elif args.command == "detect":
+        benchmark_detection(args.rounds, args.interval)
+    elif args.command == "restart":
+        benchmark_restart(args.sizes, args.in_doubt_every)
@@ -0,0 +1,562 @@
+import argparse
+import collections
+import itertools
+import queue
+import socket
+import threading
+import time
+
+from failure_detector import HEARTBEAT_INTERVAL, PHI_THRESHOLD, PhiAccrualFailureDetector
+from paxos_commit import AcceptorSet, acceptor_addresses
+from protocol import MessageReader, send_message
+from transaction_state import TransactionRecord, TxState
+from txn_log import TransactionLog
+
+LOG_FILE = "coordinator_log_part4.jsonl"
+VOTE_TIMEOUT = 10  # Seconds to wait for every vote before aborting
+SWEEP_INTERVAL = 0.5  # Seconds between checks for expired votes
+DELIVERY_RETRY = 1.0  # Seconds before an unacknowledged commit is sent again
+RESOLVE_ATTEMPT = 5  # Seconds per attempt to settle a transaction through the acceptors
+
+
+class Session:
+    """
+    A connected participant or application, with a lock serializing writes to its socket.
+    """
+
+    __slots__ = ("sock", "send_lock", "peer_id", "detector")
+
+    def __init__(self, sock, peer_id=None):
+        self.sock = sock
+        self.send_lock = threading.Lock()
+        self.peer_id = peer_id
+        self.detector = None  # Set for participant sessions
+
+    def send(self, message):
+        """
+        Send a message, returning False if the connection is gone.
+        """
+        try:
+            with self.send_lock:
+                send_message(self.sock, message)
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        """
+        Shut the socket down, waking up the thread reading from it.
+        """
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class CoordinatorService:
+    """
+    Long-running transaction coordinator for Part 4.
+    Participants keep a session open and vote on any number of transactions,
+    while applications submit transactions (see txn_client.py) over their own sessions.
+    Commit decisions are forced to an append-only log, and the application is answered
+    as soon as that write is durable; phase two (sending decisions, collecting acks, retrying)
+    runs on a background delivery worker. Committed transactions without a 'done' entry in
+    the log form the pending delivery set, which is rebuilt and resumed after a restart.
+    Aborts are not logged (presumed abort), so an unknown transaction is answered with 'abort'.
+    Heartbeats flow both ways on participant sessions; a participant suspected by the
+    failure detector is dropped at once, aborting the transactions waiting for its vote.
+
+    With `acceptors` set, the coordinator runs Paxos Commit: participants record their votes
+    on the acceptors before voting, so the decision needs no forced coordinator log write and
+    any node can compute it (see paxos_commit.py). A missing vote is then settled through the
+    acceptors instead of being treated as 'no'.
+    """
+
+    def __init__(self, host="127.0.0.1", port=5000, log_file=LOG_FILE, vote_timeout=VOTE_TIMEOUT,
+                 heartbeat_interval=HEARTBEAT_INTERVAL, phi_threshold=PHI_THRESHOLD, acceptors=None):
+        self.host = host
+        self.port = port
+        self.log_file = log_file
+        self.vote_timeout = vote_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.phi_threshold = phi_threshold
+        self.server = None
+        self.running = False
+        self.lock = threading.Lock()  # Guards the tables below
+        self.participants = {}  # participant id -> Session
+        self.transactions = {}  # txid -> TransactionRecord, until every commit is acknowledged
+        self.waiters = {}  # txid -> (application Session, request id)
+        self.awaiting_votes = collections.defaultdict(set)  # participant id -> undecided txids lacking its vote
+        self.undelivered = collections.defaultdict(set)  # participant id -> announced txids it has not acknowledged
+        self.vote_deadlines = collections.OrderedDict()  # txid -> deadline, oldest first
+        self.delivery_queue = queue.Queue()  # Decided transactions waiting for phase two
+        self.retry_deadlines = collections.OrderedDict()  # Unacknowledged commits -> next resend, oldest first
+        self.inquiries = queue.Queue()  # (Session, message) inquiries to answer from the log
+        self.epoch = time.time_ns() // 1_000_000  # Keeps transaction ids unique across restarts
+        self.counter = itertools.count(1)
+        self.paxos = AcceptorSet(acceptors, "coordinator") if acceptors else None
+        self.resolving = set()  # Transactions being settled through the acceptors
+        self.answering = {}  # txid -> Sessions whose inquiry awaits the acceptors
+        self.logging = set()  # Commits decided but not yet in the log; their decision is not announced
+        self.log = TransactionLog(log_file)
+        self.recover()
+
+    def recover(self):
+        """
+        Rebuild the commits that were still waiting for acknowledgements when the coordinator stopped.
+        Only those entries are read (see TransactionLog), so startup does not scale with the log size.
+        """
+        for txid, entry in self.log.recover().items():
+            record = self.transactions[txid] = TransactionRecord.from_log(entry)
+            for participant_id in record.pending_participants():
+                self.undelivered[participant_id].add(txid)
+        print(f"[Coordinator] Recovered {len(self.transactions)} committed transactions awaiting delivery.")
+
+    def append_log(self, entry, force=False):
+        """
+        Append an entry to the coordinator log, forcing it to disk if requested.
+        Returns False if the log is already closed by shutdown().
+        """
+        return self.log.append(entry, force)
+
+    def start(self):
+        """
+        Bind the server socket and start accepting sessions in the background.
+        """
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self.host, self.port))
+        self.server.listen(128)
+        self.port = self.server.getsockname()[1]
+        self.running = True
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+        threading.Thread(target=self.sweep_votes, daemon=True).start()
+        threading.Thread(target=self.monitor_participants, daemon=True).start()
+        threading.Thread(target=self.delivery_worker, daemon=True).start()
+        threading.Thread(target=self.inquiry_worker, daemon=True).start()
+        for txid in list(self.transactions):
+            self.delivery_queue.put(txid)  # Resume delivery of recovered commits
+        print(f"[Coordinator] Listening on {self.host}:{self.port}")
+
+    def serve_forever(self):
+        """
+        Run the coordinator until interrupted.
+        """
+        self.start()
+        try:
+            while self.running:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """
+        Stop accepting sessions, drop the participant sessions, then close the log.
+        """
+        self.running = False
+        if self.server:
+            self.server.close()
+        with self.lock:
+            sessions = list(self.participants.values())
+        for session in sessions:
+            session.close()
+        self.log.close()
+
+    def accept_loop(self):
+        """
+        Accept sessions and hand each one to its own thread.
+        """
+        while self.running:
+            try:
+                sock, addr = self.server.accept()
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self.handle_session, args=(sock,), daemon=True).start()
+
+    def handle_session(self, sock):
+        """
+        Read the hello message, then dispatch every message from the session.
+        """
+        session = Session(sock)
+        reader = MessageReader(sock)
+        try:
+            hello = reader.read()
+            if not hello or hello.get("type") != "hello":
+                return
+            if hello["role"] == "participant":
+                session.peer_id = str(hello["id"])
+                session.detector = PhiAccrualFailureDetector(self.heartbeat_interval, self.phi_threshold)
+                self.participant_joined(session)
+                handlers = {"vote": self.on_vote, "ack": self.on_ack, "inquire": self.on_inquire}
+            else:
+                handlers = {"begin": self.on_begin}
+            while True:
+                message = reader.read()
+                if message is None:
+                    break
+                if session.detector:
+                    session.detector.heartbeat()  # Any message proves the participant is alive
+                handler = handlers.get(message.get("type"))
+                if handler:
+                    handler(session, message)
+        except (OSError, ValueError) as e:
+            print(f"[Coordinator] Session error: {e}")
+        finally:
+            sock.close()
+            if session.peer_id is not None:
+                self.participant_failed(session)
+
+    def participant_joined(self, session):
+        """
+        Register a participant session and resend any commit it has not acknowledged.
+        """
+        participant_id = session.peer_id
+        with self.lock:
+            self.participants[participant_id] = session
+            undelivered = [(txid, self.transactions[txid].decision) for txid in self.undelivered[participant_id]]
+        print(f"[Coordinator] Participant {participant_id} joined; {len(undelivered)} decisions to resend.")
+        for txid, decision in undelivered:
+            session.send({"type": "decision", "txid": txid, "decision": decision})
+
+    def participant_failed(self, session):
+        """
+        Drop a participant session and abort the transactions still waiting for its vote.
+        """
+        participant_id = session.peer_id
+        with self.lock:
+            if self.participants.get(participant_id) is not session:
+                return  # Already replaced by a newer session
+            del self.participants[participant_id]
+            waiting = list(self.awaiting_votes[participant_id])
+        print(f"[Coordinator] Participant {participant_id} disconnected; {len(waiting)} transactions lack its vote.")
+        for txid in waiting:
+            self.vote_missing(txid, participant_id)
+
+    def on_begin(self, session, message):
+        """
+        Start a transaction for an application and send 'prepare' to its participants.
+        If any participant is not connected the transaction aborts before any 'prepare' is sent.
+        """
+        participants = message.get("participants")
+        if "request" not in message or not isinstance(participants, list) or not participants:
+            print(f"[Coordinator] Rejecting malformed 'begin': {message}")
+            session.send({"type": "result", "request": message.get("request"), "decision": "abort",
+                          "error": "A 'begin' needs a request id and a non-empty participant list"})
+            return
+        txid = f"{self.epoch}.{next(self.counter)}"
+        participants = list(dict.fromkeys(str(participant_id) for participant_id in participants))
+        with self.lock:
+            sessions = [(participant_id, self.participants.get(participant_id)) for participant_id in participants]
+            missing = [participant_id for participant_id, participant in sessions if participant is None]
+            if not missing:
+                self.transactions[txid] = TransactionRecord(participants)
+                self.waiters[txid] = (session, message["request"])
+                self.vote_deadlines[txid] = time.monotonic() + self.vote_timeout
+                for participant_id in participants:
+                    self.awaiting_votes[participant_id].add(txid)
+        if missing:
+            print(f"[Coordinator] Participants {', '.join(missing)} not connected; aborting {txid}.")
+            session.send({"type": "result", "request": message["request"], "txid": txid, "decision": "abort"})
+            return
+        prepare = {"type": "prepare", "txid": txid, "participants": participants}
+        for participant_id, participant in sessions:
+            if not participant.send(prepare):
+                self.vote_missing(txid, participant_id)
+
+    def on_vote(self, session, message):
+        """
+        Record a participant's vote. In Paxos Commit mode a participant that could not get its
+        vote accepted by the acceptors votes 'unknown', and the outcome is settled there.
+        """
+        with self.lock:
+            record = self.transactions.get(message["txid"])
+            decided = record is None or record.decision is not None
+        if decided:
+            # A late vote (e.g. a 'prepare' that raced with the decision); resend the outcome
+            self.on_inquire(session, message)
+        elif message["vote"] == "unknown":
+            self.vote_missing(message["txid"], session.peer_id)
+        else:
+            self.record_vote(message["txid"], session.peer_id, message["vote"])
+
+    def vote_missing(self, txid, participant_id):
+        """
+        Handle a participant whose vote did not arrive (timeout, failure, or lost session).
+        In classic 2PC that counts as 'no'. In Paxos Commit mode the participant may already have
+        had 'prepared' chosen, so the outcome is computed from the acceptors instead.
+        """
+        if self.paxos is None:
+            self.record_vote(txid, participant_id, "no")
+            return
+        with self.lock:
+            record = self.transactions.get(txid)
+            if record is None or record.decision is not None or txid in self.resolving:
+                return
+            self.resolving.add(txid)
+        threading.Thread(target=self.resolve_with_acceptors, args=(txid, record), daemon=True).start()
+
+    def resolve_with_acceptors(self, txid, record):
+        """
+        Decide a transaction from the votes chosen on the acceptors.
+        """
+        try:
+            decision = self.resolve_until_stopped(txid, record.participants, lambda: record.decision is None)
+        finally:
+            with self.lock:
+                self.resolving.discard(txid)
+        if decision is None:
+            return
+        print(f"[Coordinator] Settled {txid} through the acceptors: {decision}.")
+        with self.lock:
+            if record.decision is not None:
+                return  # The votes arrived first; they agree with the acceptors
+            self.decide(txid, record, decision)
+        self.finish_phase_one(txid, record)
+
+    def record_vote(self, txid, participant_id, vote):
+        """
+        Apply a vote and decide as soon as the outcome is known:
+        abort on the first 'no', commit once every participant has voted 'yes'.
+        """
+        with self.lock:
+            record = self.transactions.get(txid)
+            if txid not in self.awaiting_votes.get(participant_id, ()):
+                return  # Decided, or this participant already voted
+            self.awaiting_votes[participant_id].discard(txid)
+            record.set_state(participant_id, TxState.PREPARED if vote == "yes" else TxState.ABORTED)
+            if vote != "yes":
+                decision = "abort"
+            elif record.all_prepared():
+                decision = "commit"
+            else:
+                return
+            self.decide(txid, record, decision)
+        self.finish_phase_one(txid, record)
+
+    def decide(self, txid, record, decision):
+        """
+        Set the decision of a transaction. A commit stays unannounced until finish_phase_one
+        has logged it. Callers must hold the lock.
+        """
+        record.decision = decision
+        self.vote_deadlines.pop(txid, None)
+        for participant_id in record.participants:
+            self.awaiting_votes[participant_id].discard(txid)
+        if decision == "commit":
+            self.logging.add(txid)
+
+    def finish_phase_one(self, txid, record):
+        """
+        Make the decision durable, answer the application, and hand phase two to the delivery worker.
+        """
+        logged = True
+        if record.decision == "commit":
+            # With Paxos Commit the acceptors already hold the votes, so the write need not be forced
+            logged = self.append_log(dict(record.to_log(), txid=txid), force=self.paxos is None)
+        with self.lock:
+            self.logging.discard(txid)
+            if not logged and self.paxos is None:
+                # Nothing durable says commit, so a restarted coordinator presumes abort; agree with it
+                print(f"[Coordinator] Log closed before {txid} was logged; aborting it.")
+                record.decision = "abort"
+            # The decision is announced from here on, so a rejoining participant is sent it too
+            for participant_id in record.pending_participants():
+                self.undelivered[participant_id].add(txid)
+        self.reply(txid, record.decision)
+        self.delivery_queue.put(txid)
+
+    def delivery_worker(self):
+        """
+        Send decisions to participants in the background.
+        Aborts are sent once and forgotten; commits are resent until every participant acknowledges.
+        """
+        while self.running:
+            try:
+                txid = self.delivery_queue.get(timeout=DELIVERY_RETRY / 2)
+            except queue.Empty:
+                txid = None
+            if txid is not None:
+                self.deliver(txid)
+            now = time.monotonic()
+            overdue = []
+            with self.lock:
+                while self.retry_deadlines:
+                    txid, deadline = next(iter(self.retry_deadlines.items()))
+                    if deadline > now:
+                        break
+                    del self.retry_deadlines[txid]
+                    overdue.append(txid)
+            for txid in overdue:
+                self.deliver(txid)
+
+    def deliver(self, txid):
+        """
+        Send the decision to every connected participant that has not acknowledged it yet.
+        """
+        with self.lock:
+            record = self.transactions.get(txid)
+            if record is None:
+                return
+            decision = record.decision
+            sessions = [self.participants.get(participant_id) for participant_id in record.pending_participants()]
+            if decision == "abort":
+                del self.transactions[txid]
+                for participant_id in record.participants:
+                    self.undelivered[participant_id].discard(txid)
+            else:
+                self.retry_deadlines[txid] = time.monotonic() + DELIVERY_RETRY
+        for participant in sessions:
+            if participant is not None:
+                participant.send({"type": "decision", "txid": txid, "decision": decision})
+        if decision == "abort" and self.paxos:
+            # The acceptors keep a tombstone, so a vote arriving late cannot reopen the transaction
+            self.paxos.forget(txid, decision)
+
+    def on_ack(self, session, message):
+        """
+        Mark a commit as delivered to a participant; complete the transaction once all have acknowledged.
+        """
+        txid = message["txid"]
+        with self.lock:
+            record = self.transactions.get(txid)
+            if record is None or record.decision is None or session.peer_id not in record.participants:
+                return
+            record.mark_sent(session.peer_id)
+            self.undelivered[session.peer_id].discard(txid)
+            if record.pending:
+                return
+            del self.transactions[txid]
+            self.retry_deadlines.pop(txid, None)
+        self.append_log({"txid": txid, "done": True})
+        if self.paxos:
+            self.paxos.forget(txid, "commit")
+
+    def on_inquire(self, session, message):
+        """
+        Answer an in-doubt participant. Undecided transactions, and commits still being logged, are
+        answered when the delivery worker sends the decision;
+        transactions no longer in memory are handed to the inquiry worker, which looks them up in the log.
+        """
+        txid = message["txid"]
+        with self.lock:
+            record = self.transactions.get(txid)
+            decision = None if record is None or txid in self.logging else record.decision
+        if record is None:
+            self.inquiries.put((session, message))
+        elif decision:
+            session.send({"type": "decision", "txid": txid, "decision": decision})
+
+    def inquiry_worker(self):
+        """
+        Answer inquiries about old transactions from the log, off the session threads, so a slow
+        lookup never delays heartbeats. Transactions absent from the log are presumed aborted.
+        In Paxos Commit mode commits are not forced to the log, so an absent transaction is
+        settled through the acceptors instead.
+        """
+        while self.running:
+            try:
+                session, message = self.inquiries.get(timeout=DELIVERY_RETRY / 2)
+            except queue.Empty:
+                continue
+            txid = message["txid"]
+            decision = self.log.lookup(txid)
+            participants = message.get("participants")
+            if decision is None and self.paxos and participants:
+                with self.lock:
+                    sessions = self.answering.setdefault(txid, [])
+                    sessions.append(session)
+                    first = len(sessions) == 1
+                if first:
+                    threading.Thread(target=self.answer_from_acceptors, args=(txid, participants),
+                                     daemon=True).start()
+                continue
+            session.send({"type": "decision", "txid": txid, "decision": decision or "abort"})
+
+    def answer_from_acceptors(self, txid, participants):
+        """
+        Answer every pending inquiry about a transaction with the outcome computed from the acceptors.
+        Gives up once none of the inquiring participants is still connected.
+        """
+        def still_needed():
+            with self.lock:
+                return any(self.participants.get(session.peer_id) is session for session in self.answering[txid])
+
+        try:
+            decision = self.resolve_until_stopped(txid, participants, still_needed)
+        finally:
+            with self.lock:
+                sessions = self.answering.pop(txid)
+        if decision is not None:
+            for session in sessions:
+                session.send({"type": "decision", "txid": txid, "decision": decision})
+
+    def resolve_until_stopped(self, txid, participants, still_needed):
+        """
+        Settle a transaction through the acceptors, retrying in bounded attempts while the
+        coordinator runs and still_needed() holds. Returns None if it stopped first.
+        """
+        while self.running and still_needed():
+            try:
+                return self.paxos.resolve(txid, participants, time.monotonic() + RESOLVE_ATTEMPT)
+            except TimeoutError:
+                print(f"[Coordinator] Acceptors unreachable while settling {txid}; retrying.")
+        return None
+
+    def reply(self, txid, decision):
+        """
+        Send the outcome to the application that submitted the transaction.
+        """
+        with self.lock:
+            waiter = self.waiters.pop(txid, None)
+        if waiter:
+            application, request_id = waiter
+            application.send({"type": "result", "request": request_id, "txid": txid, "decision": decision})
+
+    def monitor_participants(self):
+        """
+        Send heartbeats to every participant and drop the ones the failure detector suspects.
+        """
+        while self.running:
+            time.sleep(self.heartbeat_interval)
+            with self.lock:
+                sessions = list(self.participants.values())
+            now = time.monotonic()
+            for session in sessions:
+                session.send({"type": "heartbeat"})
+                phi = session.detector.phi(now)
+                if phi > self.phi_threshold:
+                    print(f"[Coordinator] Participant {session.peer_id} suspected (phi={phi:.1f}).")
+                    self.participant_failed(session)
+                    session.close()
+
+    def sweep_votes(self):
+        """
+        Abort transactions whose votes did not all arrive within the vote timeout.
+        """
+        while self.running:
+            time.sleep(SWEEP_INTERVAL)
+            now = time.monotonic()
+            expired = []
+            with self.lock:
+                while self.vote_deadlines:
+                    txid, deadline = next(iter(self.vote_deadlines.items()))
+                    if deadline > now:
+                        break
+                    del self.vote_deadlines[txid]
+                    expired.extend((txid, participant_id) for participant_id in self.transactions[txid].participants
+                                   if txid in self.awaiting_votes[participant_id])
+            for txid, participant_id in expired:
+                print(f"[Coordinator] Timeout waiting for vote from Participant {participant_id} on {txid}.")
+                self.vote_missing(txid, participant_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Part 4 coordinator service.")
+    parser.add_argument("port", type=int, nargs="?", default=5000)
+    parser.add_argument("--paxos", action="store_true", help="Use Paxos Commit with the local acceptors")
+    args = parser.parse_args()
+
+    CoordinatorService(port=args.port, acceptors=acceptor_addresses() if args.paxos else None).serve_forever()
@@ -0,0 +1,80 @@
+import collections
+import math
+import threading
+import time
+
+HEARTBEAT_INTERVAL = 0.02  # Seconds between heartbeats on a session
+PHI_THRESHOLD = 8.0  # Suspicion level above which a peer is considered failed
+MIN_STD_DEV = 0.005  # Floor for the standard deviation of heartbeat intervals, in seconds
+ACCEPTABLE_PAUSE = 0.02  # Extra delay tolerated on top of the mean interval (e.g. GC or scheduling)
+WINDOW_SIZE = 100  # Number of recent heartbeat intervals kept
+
+
+class PhiAccrualFailureDetector:
+    """
+    Phi accrual failure detector (Hayashibara et al.).
+    Instead of a fixed timeout it reports a suspicion level phi, derived from how
+    late the current heartbeat is compared with the recent interval distribution.
+    With 20 ms heartbeats on a LAN a dead peer is suspected within tens of milliseconds.
+    """
+
+    def __init__(self, interval=HEARTBEAT_INTERVAL, threshold=PHI_THRESHOLD,
+                 min_std_dev=MIN_STD_DEV, acceptable_pause=ACCEPTABLE_PAUSE, window=WINDOW_SIZE):
+        self.threshold = threshold
+        self.min_std_dev = min_std_dev
+        self.acceptable_pause = acceptable_pause
+        self.intervals = collections.deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.lock = threading.Lock()
+        self.last = time.monotonic()
+        # Seed the history with the expected interval so the first heartbeats are judged sensibly
+        for seed in (interval * 0.75, interval * 1.25):
+            self.add_interval(seed)
+
+    def add_interval(self, interval):
+        """
+        Add an interval to the sliding window, keeping running sums for O(1) mean and variance.
+        """
+        if len(self.intervals) == self.intervals.maxlen:
+            oldest = self.intervals[0]
+            self.total -= oldest
+            self.total_sq -= oldest * oldest
+        self.intervals.append(interval)
+        self.total += interval
+        self.total_sq += interval * interval
+
+    def heartbeat(self, now=None):
+        """
+        Record that the peer was heard from.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.add_interval(now - self.last)
+            self.last = now
+
+    def phi(self, now=None):
+        """
+        Return the current suspicion level of the peer.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            count = len(self.intervals)
+            mean = self.total / count
+            variance = max(self.total_sq / count - mean * mean, 0.0)
+            elapsed = now - self.last
+        std_dev = max(math.sqrt(variance), self.min_std_dev)
+        y = max((elapsed - mean - self.acceptable_pause) / std_dev, -10.0)
+        # Logistic approximation of the normal CDF, as used by Akka and Cassandra
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if e == 0.0:
+            return math.inf
+        if elapsed > mean + self.acceptable_pause:
+            return -math.log10(e / (1.0 + e))
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
+
+    def suspected(self, now=None):
+        """
+        True once phi has crossed the threshold.
+        """
+        return self.phi(now) > self.threshold
@@ -3,6 +3,8 @@ import json
 import threading
 import os
 
+from transaction_state import TransactionRecord, TxState
+
 LOG_FILE = "transaction_log_part4.json"
 
 
@@ -16,7 +18,7 @@ class TransactionManager:
         self.host = host
         self.port = port
         self.server = None
-        self.log = self.load_log()
+        self.txn = self.load_log()
         self.lock = threading.Lock()
 
     def load_log(self):
@@ -25,13 +27,9 @@ class TransactionManager:
         """
         if os.path.exists(LOG_FILE):
             with open(LOG_FILE, "r") as file:
-                log = json.load(file)
-            # Ensure required keys are present
-            log.setdefault("clients", {})
-            log.setdefault("decision", None)
-            return log
+                return TransactionRecord.from_log(json.load(file))
         else:
-            return {"clients": {}, "decision": None}
+            return TransactionRecord()
 
     def save_log(self):
         """
@@ -39,20 +37,21 @@ class TransactionManager:
         """
         with self.lock:
             with open(LOG_FILE, "w") as file:
-                json.dump(self.log, file)
+                json.dump(self.txn.to_log(), file)
 
-    def log_client_status(self, client_id, status):
+    def log_client_status(self, client_id, state):
         """
-        Update the status of a client in the transaction log.
+        Update the state of a client in the transaction log.
         """
-        self.log["clients"][client_id] = status
+        with self.lock:
+            self.txn.set_state(client_id, state)
         self.save_log()
 
     def log_decision(self, decision):
         """
         Record the final decision (commit or abort) in the transaction log.
         """
-        self.log["decision"] = decision
+        self.txn.decision = decision
         self.save_log()
 
     def handle_client(self, client_socket, client_id):
@@ -68,12 +67,12 @@ class TransactionManager:
             response = client_socket.recv(1024).decode()
             print(f"[Manager] Received '{response}' from Client {client_id}")
             if response == "yes":
-                self.log_client_status(client_id, "prepared")
+                self.log_client_status(client_id, TxState.PREPARED)
             else:
-                self.log_client_status(client_id, "aborted")
+                self.log_client_status(client_id, TxState.ABORTED)
         except Exception as e:
             print(f"[Manager] Error communicating with Client {client_id}: {e}")
-            self.log_client_status(client_id, "aborted")
+            self.log_client_status(client_id, TxState.ABORTED)
         finally:
             client_socket.close()
 
@@ -82,18 +81,20 @@ class TransactionManager:
         Send the final decision (commit/abort) to all clients based on the transaction log.
         """
         print("[Manager] Sending final decision to clients...")
-        for client_id, status in self.log["clients"].items():
-            if "sent" not in status:
-                try:
-                    # Wait for the client to reconnect
-                    client_socket, addr = self.server.accept()
-                    print(f"[Manager] Reconnected with Client at {addr}")
-                    client_socket.sendall(self.log["decision"].encode())
-                    print(f"[Manager] Sent '{self.log['decision']}' to Client {client_id}")
-                    self.log_client_status(client_id, f"{self.log['decision']}_sent")
-                    client_socket.close()
-                except Exception as e:
-                    print(f"[Manager] Error sending decision to Client {client_id}: {e}")
+        decision = self.txn.decision
+        for client_id in self.txn.pending_participants():
+            try:
+                # Wait for the client to reconnect
+                client_socket, addr = self.server.accept()
+                print(f"[Manager] Reconnected with Client at {addr}")
+                client_socket.sendall(decision.encode())
+                print(f"[Manager] Sent '{decision}' to Client {client_id}")
+                with self.lock:
+                    self.txn.mark_sent(client_id)
+                self.save_log()
+                client_socket.close()
+            except Exception as e:
+                print(f"[Manager] Error sending decision to Client {client_id}: {e}")
 
     def transaction_coordinator(self):
         """
@@ -108,11 +109,11 @@ class TransactionManager:
         client_threads = []
 
         # Only accept new clients if not recovering
-        if not self.log["clients"]:
+        if not self.txn.participants:
             for i in range(2):  # Adjust for more clients if needed
                 client_socket, addr = self.server.accept()
                 print(f"[Manager] Client {i + 1} connected from {addr}")
-                self.log_client_status(f"{addr[0]}:{addr[1]}", "connected")
+                self.log_client_status(f"{addr[0]}:{addr[1]}", TxState.CONNECTED)
                 thread = threading.Thread(target=self.handle_client, args=(client_socket, f"{addr[0]}:{addr[1]}"))
                 client_threads.append(thread)
                 thread.start()
@@ -122,7 +123,7 @@ class TransactionManager:
                 thread.join()
 
             # Decide to commit or abort based on client responses
-            if all(status == "prepared" for status in self.log["clients"].values()):
+            if self.txn.all_prepared():
                 print("[Manager] All clients agreed. Committing transaction.")
                 self.log_decision("commit")
             else:
@@ -0,0 +1,257 @@
+import collections
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+from failure_detector import HEARTBEAT_INTERVAL, PHI_THRESHOLD, PhiAccrualFailureDetector
+from paxos_commit import AcceptorSet, acceptor_addresses
+from protocol import MessageReader, send_message
+
+LOG_FILE_TEMPLATE = "participant_{participant_id}_log.jsonl"
+RETRY_INTERVAL = 5  # Seconds between reconnection attempts
+RESOLVE_TIMEOUT = 5  # Seconds to settle in-doubt transactions with the acceptors before asking the coordinator
+DECIDED_MEMORY = 10000  # Recently decided transactions remembered to refuse late 'prepare' messages
+
+
+class ParticipantService:
+    """
+    Long-running participant for the Part 4 coordinator service.
+    Keeps one session open, votes on every 'prepare', and logs 'prepared' before voting
+    so that in-doubt transactions can be resolved by asking the coordinator after a restart.
+    If the failure detector suspects the coordinator, the session is dropped and the
+    participant reconnects straight away to inquire about its in-doubt transactions.
+
+    With `acceptors` set (Paxos Commit), a 'yes' vote is first accepted by a majority of the
+    acceptors, and when the coordinator is lost the participant settles its in-doubt
+    transactions with the acceptors itself instead of waiting for the coordinator to return.
+    """
+
+    def __init__(self, participant_id, host="127.0.0.1", port=5000, vote="yes", fsync=True,
+                 heartbeat_interval=HEARTBEAT_INTERVAL, phi_threshold=PHI_THRESHOLD, acceptors=None):
+        self.participant_id = str(participant_id)
+        self.host = host
+        self.port = port
+        self.vote = vote
+        self.fsync = fsync
+        self.heartbeat_interval = heartbeat_interval
+        self.phi_threshold = phi_threshold
+        self.running = True
+        self.sock = None
+        self.send_lock = threading.Lock()  # The heartbeat thread shares the socket
+        self.paxos = AcceptorSet(acceptors, f"participant-{participant_id}") if acceptors else None
+        self.log_file = LOG_FILE_TEMPLATE.format(participant_id=participant_id)
+        self.in_doubt = self.load_log()
+        self.decided = collections.OrderedDict()  # txid -> decision, most recent last
+        self.log = open(self.log_file, "a")
+
+    def load_log(self):
+        """
+        Replay the log and return {txid: participants} for transactions that are prepared but undecided.
+        """
+        in_doubt = {}
+        if os.path.exists(self.log_file):
+            with open(self.log_file, "r") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn write at the end of the log
+                    if entry["state"] == "prepared":
+                        in_doubt[entry["txid"]] = entry.get("participants")
+                    else:
+                        in_doubt.pop(entry["txid"], None)
+        return in_doubt
+
+    def set_state(self, txid, state, participants=None):
+        """
+        Append the new state of a transaction to the log.
+        """
+        entry = {"txid": txid, "state": state}
+        if participants is not None:
+            entry["participants"] = participants
+        self.log.write(json.dumps(entry) + "\n")
+        self.log.flush()
+        if self.fsync:
+            os.fsync(self.log.fileno())
+
+    def send(self, sock, message):
+        """
+        Send a message to the coordinator under the send lock.
+        """
+        with self.send_lock:
+            send_message(sock, message)
+
+    def connect(self):
+        """
+        Connect to the coordinator, retrying until it is available.
+        """
+        while self.running:
+            try:
+                sock = socket.create_connection((self.host, self.port))
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                print(f"[Participant {self.participant_id}] Connected to Coordinator.")
+                return sock
+            except ConnectionRefusedError:
+                print(f"[Participant {self.participant_id}] Coordinator not available. Retrying...")
+                time.sleep(RETRY_INTERVAL)
+        return None
+
+    def run(self):
+        """
+        Serve the coordinator until stopped, reconnecting whenever the session is lost.
+        """
+        while self.running:
+            if self.paxos and self.in_doubt:
+                self.resolve_in_doubt()
+            self.sock = self.connect()
+            if self.sock is None:
+                break
+            try:
+                self.serve_session(self.sock)
+            except (OSError, ValueError) as e:
+                if self.running:
+                    print(f"[Participant {self.participant_id}] Error: {e}")
+            finally:
+                self.sock.close()
+                print(f"[Participant {self.participant_id}] Connection closed.")
+
+    def serve_session(self, sock):
+        """
+        Announce ourselves, ask about in-doubt transactions, then handle messages.
+        """
+        self.send(sock, {"type": "hello", "role": "participant", "id": self.participant_id})
+        for txid in sorted(self.in_doubt):
+            print(f"[Participant {self.participant_id}] Inquiring about in-doubt transaction {txid}.")
+            self.send(sock, {"type": "inquire", "txid": txid, "participants": self.in_doubt[txid]})
+
+        detector = PhiAccrualFailureDetector(self.heartbeat_interval, self.phi_threshold)
+        session_open = threading.Event()
+        session_open.set()
+        threading.Thread(target=self.monitor_coordinator, args=(sock, detector, session_open), daemon=True).start()
+
+        reader = MessageReader(sock)
+        try:
+            while True:
+                message = reader.read()
+                if message is None:
+                    return
+                detector.heartbeat()
+                self.handle_message(sock, message)
+        finally:
+            session_open.clear()
+
+    def handle_message(self, sock, message):
+        """
+        Vote on 'prepare' and apply and acknowledge decisions.
+        """
+        if message["type"] == "prepare":
+            txid = message["txid"]
+            participants = message.get("participants", [self.participant_id])
+            if txid in self.in_doubt:
+                return  # Duplicate 'prepare'; the first one is already being voted on
+            if txid in self.decided:
+                # The decision got here first; do not prepare. The coordinator answers a vote
+                # on a decided transaction by sending its outcome again.
+                vote = "yes" if self.decided[txid] == "commit" else "no"
+                self.send(sock, {"type": "vote", "txid": txid, "vote": vote})
+                return
+            if self.vote == "yes":
+                self.set_state(txid, "prepared", participants)
+                self.in_doubt[txid] = participants
+                if self.paxos:
+                    # Vote once the acceptors hold 'prepared'; keep reading in the meantime
+                    accepted = self.paxos.record_vote(txid, self.participant_id, "prepared")
+                    accepted.add_done_callback(lambda future, txid=txid: self.send_paxos_vote(sock, txid, future))
+                    return
+            else:
+                # Never proposing 'prepared' means the acceptors can only ever choose 'aborted'
+                self.set_state(txid, "aborted")
+            self.send(sock, {"type": "vote", "txid": txid, "vote": self.vote})
+        elif message["type"] == "decision":
+            txid = message["txid"]
+            if txid in self.in_doubt:
+                self.set_state(txid, message["decision"])
+                self.in_doubt.pop(txid)
+            if txid not in self.decided:
+                self.decided[txid] = message["decision"]
+                if len(self.decided) > DECIDED_MEMORY:
+                    self.decided.popitem(last=False)
+            # Acknowledge even repeated decisions, in case an earlier ack was lost
+            self.send(sock, {"type": "ack", "txid": txid})
+
+    def send_paxos_vote(self, sock, txid, accepted):
+        """
+        Vote 'yes' once a majority of acceptors accepted 'prepared'; otherwise a recoverer may
+        have settled the vote first, so vote 'unknown' and let the coordinator ask the acceptors.
+        """
+        vote = "yes" if accepted.result() else "unknown"
+        try:
+            self.send(sock, {"type": "vote", "txid": txid, "vote": vote})
+        except OSError:
+            pass  # Session lost; the transaction is settled through the acceptors
+
+    def resolve_in_doubt(self):
+        """
+        Settle every in-doubt transaction through the acceptors, without the coordinator.
+        Entries logged without a participant list predate Paxos Commit and are left to the coordinator,
+        as is everything still in doubt if no majority of acceptors answers within RESOLVE_TIMEOUT.
+        """
+        deadline = time.monotonic() + RESOLVE_TIMEOUT
+        for txid, participants in list(self.in_doubt.items()):
+            if not participants:
+                continue
+            try:
+                decision = self.paxos.resolve(txid, participants, deadline)
+            except TimeoutError:
+                print(f"[Participant {self.participant_id}] Acceptors unreachable; "
+                      f"asking the coordinator about {len(self.in_doubt)} in-doubt transactions.")
+                return
+            print(f"[Participant {self.participant_id}] Settled in-doubt transaction {txid} "
+                  f"through the acceptors: {decision}")
+            self.set_state(txid, decision)
+            self.in_doubt.pop(txid)
+
+    def monitor_coordinator(self, sock, detector, session_open):
+        """
+        Send heartbeats to the coordinator and drop the session once it is suspected.
+        """
+        while session_open.is_set():
+            time.sleep(self.heartbeat_interval)
+            try:
+                self.send(sock, {"type": "heartbeat"})
+            except OSError:
+                return
+            phi = detector.phi()
+            if phi > self.phi_threshold and session_open.is_set():
+                print(f"[Participant {self.participant_id}] Coordinator suspected (phi={phi:.1f}); "
+                      f"{len(self.in_doubt)} transactions in doubt.")
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                return
+
+    def stop(self):
+        """
+        Stop the service and close its session.
+        """
+        self.running = False
+        if self.sock:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--paxos"]
+    if len(args) not in (1, 2):
+        print("Usage: python participant.py <participant_id> [yes|no] [--paxos]")
+        sys.exit(1)
+
+    vote = args[1] if len(args) == 2 else "yes"
+    acceptors = acceptor_addresses() if "--paxos" in sys.argv else None
+    ParticipantService(args[0], vote=vote, acceptors=acceptors).run()
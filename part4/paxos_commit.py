@@ -0,0 +1,509 @@
+import argparse
+import collections
+import itertools
+import json
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from protocol import MessageReader, send_message
+
+ACCEPTOR_PORTS = (5101, 5102, 5103)  # Default local acceptors; tolerates one failure
+LOG_FILE_TEMPLATE = "acceptor_{index}_log.jsonl"
+ACCEPTOR_TIMEOUT = 2  # Seconds to wait for a majority of acceptors
+BALLOT_ZERO = [0, ""]  # Reserved for a participant proposing its own vote
+TOMBSTONE_TTL = 3600  # Seconds a forgotten transaction keeps refusing late ballots
+COMPACT_EVERY = 100_000  # Log entries written before the acceptor log is considered for compaction
+
+
+class Acceptor:
+    """
+    Paxos acceptor for Paxos Commit (Gray and Lamport).
+    Runs one Paxos instance per (transaction, participant) deciding that participant's
+    vote, 'prepared' or 'aborted'. Promises and accepted values are logged before replying.
+    A forgotten transaction leaves a tombstone with its outcome: later ballots for it are
+    refused with that outcome, so a late ballot-0 vote cannot recreate its instances.
+
+    Tombstones expire after `tombstone_ttl` seconds; participants only propose ballot 0 right
+    after 'prepare', so a vote arriving later than that is not expected. Once the log holds far
+    more entries than live state, it is rewritten with only the live instances and tombstones,
+    so memory and restart time follow the open transactions rather than the history.
+    """
+
+    def __init__(self, index, host="127.0.0.1", port=None, fsync=True,
+                 tombstone_ttl=TOMBSTONE_TTL, compact_every=COMPACT_EVERY):
+        self.index = index
+        self.host = host
+        self.port = ACCEPTOR_PORTS[index] if port is None else port
+        self.fsync = fsync
+        self.tombstone_ttl = tombstone_ttl
+        self.compact_every = compact_every
+        self.server = None
+        self.running = False
+        self.lock = threading.Lock()
+        self.log_file = LOG_FILE_TEMPLATE.format(index=index)
+        self.instances = {}  # txid -> {participant: [promised, accepted ballot, value]}
+        self.outcomes = collections.OrderedDict()  # Forgotten txid -> ('commit' or 'abort', time), oldest first
+        self.logged = 0  # Entries in the log file
+        self.next_compaction = compact_every  # Log size at which compaction is next considered
+        self.load_log()
+        self.log = open(self.log_file, "a")
+
+    def load_log(self):
+        """
+        Replay the acceptor log; later entries for an instance replace earlier ones.
+        """
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # Torn write at the end of the log
+                self.logged += 1
+                if entry.get("forget"):
+                    self.instances.pop(entry["txid"], None)
+                    self.outcomes.pop(entry["txid"], None)  # A repeated tombstone counts from its latest time
+                    self.outcomes[entry["txid"]] = (entry["decision"], entry.get("at", 0))
+                else:
+                    self.instances.setdefault(entry["txid"], {})[entry["participant"]] = entry["state"]
+        self.expire_tombstones()
+
+    def expire_tombstones(self):
+        """
+        Drop tombstones older than the tombstone TTL. Callers must hold the lock (or be loading).
+        """
+        horizon = time.time() - self.tombstone_ttl
+        while self.outcomes and next(iter(self.outcomes.values()))[1] < horizon:
+            self.outcomes.popitem(last=False)
+
+    def compact(self):
+        """
+        Rewrite the log with only the live instances and tombstones. Callers must hold the lock.
+        """
+        temp_path = self.log_file + ".tmp"
+        entries = [{"txid": txid, "participant": participant, "state": state}
+                   for txid, participants in self.instances.items() for participant, state in participants.items()]
+        entries.extend({"txid": txid, "forget": True, "decision": decision, "at": at}
+                       for txid, (decision, at) in self.outcomes.items())
+        with open(temp_path, "w") as file:
+            file.writelines(json.dumps(entry) + "\n" for entry in entries)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        self.log.close()
+        os.replace(temp_path, self.log_file)
+        self.log = open(self.log_file, "a")
+        self.logged = len(entries)
+
+    def write_entry(self, entry):
+        """
+        Append an entry to the acceptor log. Callers must hold the lock.
+        """
+        self.log.write(json.dumps(entry) + "\n")
+        self.log.flush()
+        if self.fsync:
+            os.fsync(self.log.fileno())
+        self.logged += 1
+        if self.logged >= self.next_compaction:
+            live = len(self.outcomes) + sum(len(participants) for participants in self.instances.values())
+            if self.logged > 2 * live:
+                self.compact()
+            self.next_compaction = self.logged + self.compact_every
+
+    def save_instance(self, txid, participant, state):
+        """
+        Log the state of one instance. Callers must hold the lock.
+        """
+        self.write_entry({"txid": txid, "participant": participant, "state": state})
+
+    def start(self):
+        """
+        Bind the server socket and start accepting connections in the background.
+        """
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self.host, self.port))
+        self.server.listen(128)
+        self.port = self.server.getsockname()[1]
+        self.running = True
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+        print(f"[Acceptor {self.index}] Listening on {self.host}:{self.port}")
+
+    def shutdown(self):
+        """
+        Stop accepting connections and close the log.
+        """
+        self.running = False
+        if self.server:
+            self.server.close()
+        with self.lock:
+            self.log.close()
+
+    def accept_loop(self):
+        """
+        Accept connections and serve each one on its own thread.
+        """
+        while self.running:
+            try:
+                sock, addr = self.server.accept()
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self.handle_connection, args=(sock,), daemon=True).start()
+
+    def handle_connection(self, sock):
+        """
+        Answer phase 1a and 2a requests; 'forget' replaces a decided transaction by a tombstone.
+        """
+        reader = MessageReader(sock)
+        handlers = {"phase1a": self.on_phase1a, "phase2a": self.on_phase2a}
+        try:
+            while True:
+                message = reader.read()
+                if message is None:
+                    break
+                if message["type"] == "forget":
+                    self.on_forget(message)
+                    continue
+                handler = handlers.get(message["type"])
+                if handler is None:
+                    continue
+                reply = handler(message)
+                reply["request"] = message["request"]
+                send_message(sock, reply)
+        except (OSError, ValueError) as e:
+            if self.running:  # After shutdown() the log is closed and requests are dropped unanswered
+                print(f"[Acceptor {self.index}] Connection error: {e}")
+        finally:
+            sock.close()
+
+    def instance(self, message):
+        """
+        Return the [promised, accepted ballot, value] state of the instance a message refers to.
+        """
+        participants = self.instances.setdefault(message["txid"], {})
+        return participants.setdefault(message["participant"], [BALLOT_ZERO, None, None])
+
+    def on_phase1a(self, message):
+        """
+        Promise not to accept lower ballots, reporting any value already accepted.
+        """
+        with self.lock:
+            if message["txid"] in self.outcomes:
+                return {"ok": False, "outcome": self.outcomes[message["txid"]][0]}
+            state = self.instance(message)
+            if tuple(message["ballot"]) <= tuple(state[0]):
+                return {"ok": False, "promised": state[0]}
+            state[0] = message["ballot"]
+            self.save_instance(message["txid"], message["participant"], state)
+            return {"ok": True, "accepted": state[1], "value": state[2]}
+
+    def on_phase2a(self, message):
+        """
+        Accept a value unless a higher ballot has been promised.
+        """
+        with self.lock:
+            if message["txid"] in self.outcomes:
+                return {"ok": False, "outcome": self.outcomes[message["txid"]][0]}
+            state = self.instance(message)
+            if tuple(message["ballot"]) < tuple(state[0]):
+                return {"ok": False, "promised": state[0]}
+            state[:] = [message["ballot"], message["ballot"], message["value"]]
+            self.save_instance(message["txid"], message["participant"], state)
+            return {"ok": True}
+
+    def on_forget(self, message):
+        """
+        Replace the instances of a decided transaction with a tombstone holding its outcome.
+        """
+        with self.lock:
+            if message["txid"] in self.outcomes:
+                return
+            self.expire_tombstones()
+            now = time.time()
+            self.instances.pop(message["txid"], None)
+            self.outcomes[message["txid"]] = (message["decision"], now)
+            self.write_entry({"txid": message["txid"], "forget": True, "decision": message["decision"], "at": now})
+
+
+class AcceptorConnection:
+    """
+    Pipelined connection to one acceptor; each request returns a Future for its reply.
+    """
+
+    def __init__(self, address):
+        self.sock = socket.create_connection(address, timeout=ACCEPTOR_TIMEOUT)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.send_lock = threading.Lock()
+        self.pending = {}  # request id -> Future
+        self.request_ids = itertools.count(1)
+        self.closed = False
+        threading.Thread(target=self.read_replies, daemon=True).start()
+
+    def request(self, message):
+        """
+        Send a request and return a Future for the acceptor's reply.
+        """
+        future = Future()
+        with self.send_lock:
+            if self.closed:
+                raise ConnectionError("Connection to the acceptor is closed")
+            request_id = next(self.request_ids)
+            self.pending[request_id] = future
+            send_message(self.sock, dict(message, request=request_id))
+        return future
+
+    def notify(self, message):
+        """
+        Send a message that gets no reply.
+        """
+        with self.send_lock:
+            send_message(self.sock, message)
+
+    def read_replies(self):
+        """
+        Resolve futures as replies arrive; fail the rest if the connection drops.
+        """
+        reader = MessageReader(self.sock)
+        try:
+            while True:
+                message = reader.read()
+                if message is None:
+                    break
+                future = self.pending.pop(message["request"], None)
+                if future is not None:
+                    future.set_result(message)
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self.send_lock:
+                self.closed = True
+                pending, self.pending = self.pending, {}
+            for future in pending.values():
+                future.set_exception(ConnectionError("Connection to the acceptor was lost"))
+            self.sock.close()
+
+
+class Quorum:
+    """
+    Future-like tally over one request sent to every acceptor.
+    The result is True once a majority replied ok, False once that can no longer happen.
+    """
+
+    def __init__(self, futures):
+        self.futures = futures
+        self.majority = len(futures) // 2 + 1
+        self.ok = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+        self.result = Future()
+        for future in futures:
+            future.add_done_callback(self.count)
+
+    def count(self, future):
+        """
+        Tally one reply (a failed connection counts as a refusal).
+        """
+        ok = future.exception() is None and future.result()["ok"]
+        with self.lock:
+            if ok:
+                self.ok += 1
+            else:
+                self.failed += 1
+            if self.result.done():
+                return
+            if self.ok >= self.majority:
+                self.result.set_result(True)
+            elif self.failed > len(self.futures) - self.majority:
+                self.result.set_result(False)
+
+    def replies(self):
+        """
+        Return the successful replies received so far.
+        """
+        return [future.result() for future in self.futures
+                if future.done() and future.exception() is None and future.result()["ok"]]
+
+    def outcome(self):
+        """
+        Return the outcome reported by an acceptor that already forgot the transaction, if any.
+        """
+        for future in self.futures:
+            if future.done() and future.exception() is None and "outcome" in future.result():
+                return future.result()["outcome"]
+        return None
+
+
+class AcceptorSet:
+    """
+    Client side of Paxos Commit, shared by the coordinator and participants.
+    A participant records its vote with ballot 0; anyone can later learn or settle
+    every vote of a transaction with resolve(), so no single coordinator can block it.
+    """
+
+    def __init__(self, addresses, node_id):
+        self.addresses = [tuple(address) for address in addresses]
+        self.node_id = str(node_id)
+        self.lock = threading.Lock()
+        self.connections = [None] * len(self.addresses)  # Future of the AcceptorConnection per acceptor
+        self.live = [None] * len(self.addresses)  # Established AcceptorConnection per acceptor, if any
+
+    def connection(self, slot):
+        """
+        Return a Future for the connection to an acceptor, dialing it again in the background
+        if it was lost or never made. Callers never wait for the dial itself.
+        """
+        with self.lock:
+            connection = self.connections[slot]
+            if connection is not None and (not connection.done() or
+                                           (connection.exception() is None and not connection.result().closed)):
+                return connection
+            connection = self.connections[slot] = Future()
+        threading.Thread(target=self.dial, args=(slot, connection), daemon=True).start()
+        return connection
+
+    def dial(self, slot, connection):
+        """
+        Connect to an acceptor and resolve the connection Future.
+        """
+        try:
+            self.live[slot] = AcceptorConnection(self.addresses[slot])
+        except OSError as e:
+            connection.set_exception(e)
+        else:
+            connection.set_result(self.live[slot])
+
+    @staticmethod
+    def forward(connection, message, reply):
+        """
+        Send a request once its connection is made, passing the acceptor's answer on to `reply`.
+        """
+        try:
+            sent = connection.result().request(message)
+        except OSError as e:
+            reply.set_exception(e)
+            return
+
+        def answered(sent):
+            if sent.exception() is None:
+                reply.set_result(sent.result())
+            else:
+                reply.set_exception(sent.exception())
+
+        sent.add_done_callback(answered)
+
+    def send_all(self, message):
+        """
+        Send a request to every acceptor.
+        Returns one Future per acceptor; unreachable acceptors get a failed Future.
+        """
+        futures = []
+        for slot in range(len(self.addresses)):
+            live = self.live[slot]
+            if live is not None and not live.closed:
+                try:
+                    futures.append(live.request(message))
+                    continue
+                except OSError:
+                    pass  # Lost just now; connection() dials again
+            reply = Future()
+            self.connection(slot).add_done_callback(
+                lambda connection, reply=reply: self.forward(connection, message, reply))
+            futures.append(reply)
+        return futures
+
+    def record_vote(self, txid, participant, value):
+        """
+        Propose a participant's own vote with ballot 0 (the fast path: no phase 1 needed).
+        Returns a Future resolving to True once a majority of acceptors accepted it.
+        """
+        message = {"type": "phase2a", "txid": txid, "participant": str(participant),
+                   "ballot": BALLOT_ZERO, "value": value}
+        return Quorum(self.send_all(message)).result
+
+    def resolve_instance(self, txid, participant, deadline=None):
+        """
+        Learn the chosen vote of one participant, proposing 'aborted' if none was accepted yet.
+        Retries with a higher ballot until a majority of acceptors answers. An acceptor that
+        already forgot the transaction answers with its outcome, which settles every vote.
+        Raises TimeoutError once `deadline` (a time.monotonic() value) passes without an answer.
+        """
+        participant = str(participant)
+        backoff = 0.001
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"No majority of acceptors settled {txid} for participant {participant}")
+            ballot = [time.time_ns(), self.node_id]
+            quorum = Quorum(self.send_all({"type": "phase1a", "txid": txid, "participant": participant,
+                                           "ballot": ballot}))
+            try:
+                if quorum.result.result(timeout=ACCEPTOR_TIMEOUT):
+                    accepted = [reply for reply in quorum.replies() if reply["accepted"] is not None]
+                    value = "aborted"
+                    if accepted:
+                        value = max(accepted, key=lambda reply: tuple(reply["accepted"]))["value"]
+                    quorum = Quorum(self.send_all({"type": "phase2a", "txid": txid, "participant": participant,
+                                                   "ballot": ballot, "value": value}))
+                    if quorum.result.result(timeout=ACCEPTOR_TIMEOUT):
+                        return value
+            except (TimeoutError, FutureTimeoutError):  # Distinct types before Python 3.11
+                pass
+            outcome = quorum.outcome()
+            if outcome is not None:
+                return "prepared" if outcome == "commit" else "aborted"
+            # Another recoverer holds a higher ballot, or no majority is reachable; back off
+            time.sleep(random.uniform(backoff, 2 * backoff))
+            backoff = min(backoff * 2, 1.0)
+
+    def resolve(self, txid, participants, deadline=None):
+        """
+        Compute the outcome of a transaction from the acceptors: 'commit' if every
+        participant's vote was chosen as 'prepared', otherwise 'abort'.
+        Raises TimeoutError if `deadline` passes first (see resolve_instance).
+        """
+        for participant in participants:
+            if self.resolve_instance(txid, participant, deadline) != "prepared":
+                return "abort"
+        return "commit"
+
+    def forget(self, txid, decision):
+        """
+        Tell the acceptors a transaction is decided, so its instances can be replaced by a tombstone.
+        """
+        message = {"type": "forget", "txid": txid, "decision": decision}
+
+        def notify(connection):
+            try:
+                connection.result().notify(message)
+            except OSError:
+                pass  # An acceptor that misses this keeps the instances, which settle to the same outcome
+
+        for slot in range(len(self.addresses)):
+            self.connection(slot).add_done_callback(notify)
+
+
+def acceptor_addresses(ports=ACCEPTOR_PORTS, host="127.0.0.1"):
+    """
+    Return the addresses of the local acceptors.
+    """
+    return [(host, port) for port in ports]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one Paxos Commit acceptor.")
+    parser.add_argument("index", type=int, help=f"Acceptor index, 0 to {len(ACCEPTOR_PORTS) - 1}")
+    args = parser.parse_args()
+
+    acceptor = Acceptor(args.index)
+    acceptor.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        acceptor.shutdown()
@@ -0,0 +1,32 @@
+import json
+
+
+def send_message(sock, message):
+    """
+    Send one message as a line of JSON.
+    Callers sharing a socket between threads must hold that socket's send lock.
+    """
+    sock.sendall((json.dumps(message) + "\n").encode())
+
+
+class MessageReader:
+    """
+    Reads newline-delimited JSON messages from a socket.
+    Several messages may arrive in one recv, so a buffer carries the remainder over.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = b""
+
+    def read(self):
+        """
+        Return the next message, or None once the peer has closed the connection.
+        """
+        while b"\n" not in self.buffer:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                return None
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return json.loads(line)
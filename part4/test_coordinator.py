@@ -0,0 +1,138 @@
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+from coordinator import DELIVERY_RETRY, CoordinatorService
+from protocol import MessageReader, send_message
+from txn_client import TransactionClient
+
+
+class FakeParticipant:
+    """
+    A participant session driven by hand, so a test decides when to vote and acknowledge.
+    """
+
+    def __init__(self, port, participant_id):
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        self.sock.settimeout(5)
+        self.reader = MessageReader(self.sock)
+        self.send({"type": "hello", "role": "participant", "id": participant_id})
+
+    def send(self, message):
+        send_message(self.sock, message)
+
+    def expect(self, kind, timeout=5):
+        """
+        Return the next message of the given type, skipping heartbeats.
+        """
+        self.sock.settimeout(timeout)
+        while True:
+            message = self.reader.read()
+            if message is None:
+                raise ConnectionError("Coordinator closed the session")
+            if message["type"] == kind:
+                return message
+
+    def close(self):
+        self.sock.close()
+
+
+class CoordinatorTest(unittest.TestCase):
+    """
+    A coordinator on an ephemeral port with hand-driven participants and a real application client.
+    Heartbeats are slowed down so silent fake participants are never suspected.
+    """
+
+    def setUp(self):
+        self.log_file = os.path.join(tempfile.mkdtemp(prefix="2pc-test-"), "log.jsonl")
+        self.coordinator = self.start_coordinator()
+        self.client = TransactionClient(port=self.coordinator.port)
+        self.addCleanup(self.client.close)
+
+    def start_coordinator(self, **options):
+        coordinator = CoordinatorService(port=0, log_file=self.log_file, heartbeat_interval=5, **options)
+        coordinator.start()
+        self.addCleanup(coordinator.shutdown)
+        return coordinator
+
+    def join(self, participant_id, coordinator=None):
+        coordinator = coordinator or self.coordinator
+        participant = FakeParticipant(coordinator.port, participant_id)
+        self.addCleanup(participant.close)
+        self.wait_until(lambda: participant_id in coordinator.participants)
+        return participant
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def commit(self, participant):
+        """
+        Run a one-participant transaction up to the commit decision, without acknowledging it.
+        """
+        future = self.client.begin(["1"])
+        txid = participant.expect("prepare")["txid"]
+        participant.send({"type": "vote", "txid": txid, "vote": "yes"})
+        self.assertEqual(future.result(timeout=5), "commit")
+        self.assertEqual(participant.expect("decision")["txid"], txid)
+        return txid
+
+    def test_rejoining_participant_is_sent_unacknowledged_decisions(self):
+        participant = self.join("1")
+        txid = self.commit(participant)
+        participant.close()
+        participant = self.join("1")
+        decision = participant.expect("decision", timeout=0.5)  # Well before the delivery retry
+        self.assertEqual((decision["txid"], decision["decision"]), (txid, "commit"))
+
+    def test_lost_participant_aborts_transactions_awaiting_its_vote(self):
+        first, second = self.join("1"), self.join("2")
+        future = self.client.begin(["1", "2"])
+        txid = first.expect("prepare")["txid"]
+        second.expect("prepare")
+        first.send({"type": "vote", "txid": txid, "vote": "yes"})
+        second.close()
+        self.assertEqual(future.result(timeout=5), "abort")
+        self.assertEqual(first.expect("decision")["decision"], "abort")
+        self.assertFalse(any(self.coordinator.awaiting_votes.values()))
+
+    def test_missing_vote_times_out(self):
+        coordinator = self.start_coordinator(vote_timeout=0.1)
+        client = TransactionClient(port=coordinator.port)
+        self.addCleanup(client.close)
+        participant = self.join("1", coordinator)
+        future = client.begin(["1"])
+        participant.expect("prepare")
+        self.assertEqual(future.result(timeout=5), "abort")
+        self.assertFalse(any(coordinator.awaiting_votes.values()))
+
+    def test_unacknowledged_commit_is_resent_until_acknowledged(self):
+        participant = self.join("1")
+        txid = self.commit(participant)
+        start = time.monotonic()
+        self.assertEqual(participant.expect("decision", timeout=DELIVERY_RETRY * 3)["txid"], txid)
+        self.assertGreater(time.monotonic() - start, DELIVERY_RETRY / 2)
+        participant.send({"type": "ack", "txid": txid})
+        self.wait_until(lambda: txid not in self.coordinator.transactions)
+        self.assertNotIn(txid, self.coordinator.retry_deadlines)
+
+    def test_restart_resumes_delivery_of_logged_commits(self):
+        txid = self.commit(self.join("1"))
+        self.coordinator.shutdown()
+        restarted = self.start_coordinator()
+        self.assertEqual(list(restarted.transactions), [txid])
+        participant = self.join("1", restarted)
+        decision = participant.expect("decision")
+        self.assertEqual((decision["txid"], decision["decision"]), (txid, "commit"))
+        participant.send({"type": "ack", "txid": txid})
+        self.wait_until(lambda: txid not in restarted.transactions)
+        restarted.shutdown()
+        self.assertEqual(self.start_coordinator().transactions, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
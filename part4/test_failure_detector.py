@@ -0,0 +1,52 @@
+import unittest
+
+from failure_detector import PhiAccrualFailureDetector
+
+
+class PhiAccrualFailureDetectorTest(unittest.TestCase):
+    """
+    Suspicion levels for scripted heartbeat timestamps; no real time passes.
+    """
+
+    def beat(self, detector, intervals):
+        """
+        Feed heartbeats at the given intervals, returning the time of the last one.
+        """
+        now = detector.last
+        for interval in intervals:
+            now += interval
+            detector.heartbeat(now)
+        return now
+
+    def test_phi_grows_with_silence(self):
+        detector = PhiAccrualFailureDetector(interval=0.1)
+        last = self.beat(detector, [0.1] * 20)
+        levels = [detector.phi(last + elapsed) for elapsed in (0.0, 0.1, 0.15, 0.2, 0.3)]
+        self.assertEqual(levels, sorted(levels))
+        self.assertLess(levels[1], 1)
+        self.assertFalse(detector.suspected(last + 0.1))
+        self.assertTrue(detector.suspected(last + 0.3))
+
+    def test_long_silence_is_infinitely_suspicious(self):
+        detector = PhiAccrualFailureDetector(interval=0.1)
+        last = self.beat(detector, [0.1] * 20)
+        self.assertEqual(detector.phi(last + 10), float("inf"))
+
+    def test_jittery_peer_is_given_more_time(self):
+        steady = PhiAccrualFailureDetector(interval=0.1)
+        jittery = PhiAccrualFailureDetector(interval=0.1)
+        steady_last = self.beat(steady, [0.1] * 40)
+        jittery_last = self.beat(jittery, [0.05, 0.15] * 20)
+        self.assertLess(jittery.phi(jittery_last + 0.2), steady.phi(steady_last + 0.2))
+
+    def test_window_forgets_old_intervals(self):
+        detector = PhiAccrualFailureDetector(interval=1.0, window=10)
+        last = self.beat(detector, [0.1] * 10)
+        self.assertLess(max(detector.intervals), 0.11)  # The 1 s seeds have rolled out
+        self.assertAlmostEqual(detector.total, 1.0)
+        self.assertAlmostEqual(detector.total_sq, 0.1)
+        self.assertTrue(detector.suspected(last + 0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
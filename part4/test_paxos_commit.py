@@ -0,0 +1,169 @@
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+from paxos_commit import BALLOT_ZERO, Acceptor, AcceptorSet
+
+
+class AcceptorTest(unittest.TestCase):
+    """
+    Promise and accept rules of a single acceptor, called directly without sockets.
+    """
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(tempfile.mkdtemp(prefix="2pc-test-"))
+        self.acceptor = Acceptor(0, port=0, fsync=False)
+
+    def tearDown(self):
+        self.acceptor.shutdown()
+        os.chdir(self.cwd)
+
+    def message(self, ballot, value=None):
+        return {"txid": "1.1", "participant": "1", "ballot": ballot, "value": value}
+
+    def test_promise_refuses_equal_or_lower_ballots(self):
+        self.assertTrue(self.acceptor.on_phase1a(self.message([5, "a"]))["ok"])
+        self.assertFalse(self.acceptor.on_phase1a(self.message([5, "a"]))["ok"])
+        self.assertFalse(self.acceptor.on_phase1a(self.message([4, "z"]))["ok"])
+        self.assertTrue(self.acceptor.on_phase1a(self.message([5, "b"]))["ok"])
+
+    def test_accept_refuses_ballots_below_the_promise(self):
+        self.acceptor.on_phase1a(self.message([5, "a"]))
+        self.assertFalse(self.acceptor.on_phase2a(self.message(BALLOT_ZERO, "prepared"))["ok"])
+        self.assertTrue(self.acceptor.on_phase2a(self.message([5, "a"], "aborted"))["ok"])
+
+    def test_promise_reports_the_accepted_value(self):
+        self.acceptor.on_phase2a(self.message(BALLOT_ZERO, "prepared"))
+        reply = self.acceptor.on_phase1a(self.message([1, "a"]))
+        self.assertEqual((reply["accepted"], reply["value"]), (BALLOT_ZERO, "prepared"))
+
+    def test_state_survives_a_restart(self):
+        self.acceptor.on_phase2a(self.message(BALLOT_ZERO, "prepared"))
+        self.acceptor.on_phase1a(self.message([7, "a"]))
+        self.acceptor.shutdown()
+        self.acceptor = Acceptor(0, port=0, fsync=False)
+        self.assertFalse(self.acceptor.on_phase1a(self.message([6, "a"]))["ok"])
+        reply = self.acceptor.on_phase1a(self.message([8, "a"]))
+        self.assertEqual(reply["value"], "prepared")
+
+    def test_forgotten_transaction_refuses_late_votes(self):
+        self.acceptor.on_forget({"txid": "1.1", "decision": "abort"})
+        reply = self.acceptor.on_phase2a(self.message(BALLOT_ZERO, "prepared"))
+        self.assertEqual((reply["ok"], reply["outcome"]), (False, "abort"))
+        self.acceptor.shutdown()
+        self.acceptor = Acceptor(0, port=0, fsync=False)
+        self.assertEqual(self.acceptor.on_phase1a(self.message([1, "a"]))["outcome"], "abort")
+
+    def test_tombstones_expire(self):
+        self.acceptor.shutdown()
+        self.acceptor = Acceptor(0, port=0, fsync=False, tombstone_ttl=0)
+        self.acceptor.on_forget({"txid": "1.1", "decision": "abort"})
+        self.acceptor.on_forget({"txid": "1.2", "decision": "abort"})
+        self.assertEqual(list(self.acceptor.outcomes), ["1.2"])
+        self.acceptor.shutdown()
+        self.acceptor = Acceptor(0, port=0, fsync=False, tombstone_ttl=0)
+        self.assertEqual(self.acceptor.outcomes, {})
+
+    def test_repeated_tombstone_expires_from_its_latest_time(self):
+        self.acceptor.shutdown()
+        with open(self.acceptor.log_file, "a") as file:
+            file.write('{"txid": "1.1", "forget": true, "decision": "abort"}\n')  # Written before tombstones had a time
+            file.write(f'{{"txid": "1.1", "forget": true, "decision": "abort", "at": {time.time()}}}\n')
+        self.acceptor = Acceptor(0, port=0, fsync=False)
+        self.assertEqual(self.acceptor.on_phase1a(self.message([1, "a"]))["outcome"], "abort")
+
+    def test_compaction_keeps_only_live_state(self):
+        self.acceptor.shutdown()
+        self.acceptor = Acceptor(0, port=0, fsync=False, compact_every=20)
+        for i in range(30):
+            for participant in ("1", "2"):
+                self.acceptor.on_phase2a(dict(self.message(BALLOT_ZERO, "prepared"), txid=f"1.{i}",
+                                              participant=participant))
+            if i != 29:
+                self.acceptor.on_forget({"txid": f"1.{i}", "decision": "commit"})
+        with open(self.acceptor.log_file) as file:
+            self.assertLess(len(file.readlines()), 60)  # 89 entries were written
+        self.acceptor.shutdown()
+        self.acceptor = Acceptor(0, port=0, fsync=False)
+        self.assertEqual(len(self.acceptor.outcomes), 29)
+        self.assertEqual(self.acceptor.instances["1.29"]["1"][2], "prepared")
+
+
+class AcceptorSetTest(unittest.TestCase):
+    """
+    Resolving transactions against three in-process acceptors.
+    """
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(tempfile.mkdtemp(prefix="2pc-test-"))
+        self.acceptors = [Acceptor(i, port=0, fsync=False) for i in range(3)]
+        for acceptor in self.acceptors:
+            acceptor.start()
+        self.paxos = AcceptorSet([("127.0.0.1", acceptor.port) for acceptor in self.acceptors], "test")
+
+    def tearDown(self):
+        for acceptor in self.acceptors:
+            acceptor.shutdown()
+        os.chdir(self.cwd)
+
+    def test_all_prepared_commits(self):
+        for participant in ("1", "2"):
+            self.assertTrue(self.paxos.record_vote("1.1", participant, "prepared").result(timeout=5))
+        self.assertEqual(self.paxos.resolve("1.1", ["1", "2"]), "commit")
+
+    def test_missing_vote_aborts_and_stays_aborted(self):
+        self.assertTrue(self.paxos.record_vote("1.1", "1", "prepared").result(timeout=5))
+        self.assertEqual(self.paxos.resolve("1.1", ["1", "2"]), "abort")
+        # The late vote loses against the recoverer's higher ballot
+        self.assertFalse(self.paxos.record_vote("1.1", "2", "prepared").result(timeout=5))
+        self.assertEqual(self.paxos.resolve("1.1", ["1", "2"]), "abort")
+
+    def test_value_chosen_at_a_competing_ballot_is_kept(self):
+        # Another recoverer got 'prepared' chosen at a ballot above the one the third acceptor accepted
+        message = {"txid": "1.1", "participant": "1", "ballot": [1, "other"], "value": "prepared"}
+        for acceptor in self.acceptors[:2]:
+            acceptor.on_phase1a(message)
+            acceptor.on_phase2a(message)
+        self.acceptors[2].on_phase2a(dict(message, ballot=BALLOT_ZERO, value="aborted"))
+        self.assertEqual(self.paxos.resolve_instance("1.1", "1"), "prepared")
+        self.assertEqual(self.paxos.resolve("1.1", ["1"]), "commit")
+
+    def test_forgotten_transaction_resolves_to_its_outcome(self):
+        self.paxos.forget("1.1", "commit")
+        deadline = time.monotonic() + 5
+        while any("1.1" not in acceptor.outcomes for acceptor in self.acceptors):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.assertEqual(self.paxos.resolve("1.1", ["1", "2"]), "commit")
+
+    def test_slow_acceptor_does_not_hold_up_the_others(self):
+        paxos = self.paxos
+        dial = paxos.dial
+
+        def slow_dial(slot, connection):
+            if slot == 2:
+                time.sleep(2)  # Like a dial to an unreachable host, up to the connect timeout
+            dial(slot, connection)
+
+        paxos.dial = slow_dial
+        start = time.monotonic()
+        self.assertTrue(paxos.record_vote("1.1", "1", "prepared").result(timeout=5))
+        self.assertTrue(paxos.record_vote("1.2", "1", "prepared").result(timeout=5))
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_unreachable_acceptors_time_out(self):
+        closed = socket.socket()
+        closed.bind(("127.0.0.1", 0))
+        address = closed.getsockname()
+        closed.close()
+        paxos = AcceptorSet([address] * 3, "test")
+        with self.assertRaises(TimeoutError):
+            paxos.resolve("1.1", ["1"], deadline=time.monotonic() + 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
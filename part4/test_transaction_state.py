@@ -0,0 +1,57 @@
+import unittest
+
+from transaction_state import TransactionRecord, TxState
+
+
+class TransactionRecordTest(unittest.TestCase):
+    """
+    The prepared counter, the pending bitmask and the log layout of a transaction record.
+    """
+
+    def test_prepared_counter_follows_votes(self):
+        record = TransactionRecord(["1", "2", "3"])
+        record.set_state("1", TxState.PREPARED)
+        record.set_state("2", TxState.PREPARED)
+        self.assertFalse(record.all_prepared())
+        record.set_state("2", TxState.ABORTED)  # Leaving PREPARED takes the vote back
+        record.set_state("3", TxState.PREPARED)
+        self.assertEqual(record.prepared, 2)
+        record.set_state("2", TxState.PREPARED)
+        self.assertTrue(record.all_prepared())
+
+    def test_unknown_participant_is_registered(self):
+        record = TransactionRecord(["1"])
+        record.set_state("2", TxState.PREPARED)
+        self.assertEqual(record.participants, ["1", "2"])
+        self.assertEqual((record.state_of("2"), record.prepared), (TxState.PREPARED, 1))
+
+    def test_pending_bitmask_tracks_delivery(self):
+        record = TransactionRecord(["1", "2", "3"], decision="commit")
+        self.assertEqual(record.pending_participants(), ["1", "2", "3"])
+        record.mark_sent("2")
+        self.assertEqual(record.state_of("2"), TxState.COMMIT_SENT)
+        self.assertEqual(record.pending_participants(), ["1", "3"])
+        record.mark_sent("1")
+        record.mark_sent("3")
+        self.assertEqual(record.pending, 0)
+
+    def test_bitmask_is_not_limited_to_a_machine_word(self):
+        participants = [str(i) for i in range(70)]
+        record = TransactionRecord(participants, decision="abort")
+        for participant_id in participants[:-1]:
+            record.mark_sent(participant_id)
+        self.assertEqual(record.pending_participants(), ["69"])
+
+    def test_log_round_trip(self):
+        record = TransactionRecord(["1", "2"], decision="commit")
+        record.set_state("1", TxState.PREPARED)
+        record.mark_sent("2")
+        log = record.to_log()
+        self.assertEqual(log, {"clients": {"1": "prepared", "2": "commit_sent"}, "decision": "commit"})
+        restored = TransactionRecord.from_log(log)
+        self.assertEqual((restored.prepared, restored.pending_participants()), (1, ["1"]))
+        self.assertEqual(restored.to_log(), log)
+
+
+if __name__ == "__main__":
+    unittest.main()
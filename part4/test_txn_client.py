@@ -0,0 +1,112 @@
+import asyncio
+import socket
+import threading
+import unittest
+
+from protocol import MessageReader, send_message
+from txn_client import TransactionClient
+
+
+class FakeCoordinator:
+    """
+    Accepts application sessions and answers 'begin' requests in batches,
+    in reverse order unless `in_order` is set.
+    """
+
+    def __init__(self, batch, in_order=False):
+        self.batch = batch
+        self.in_order = in_order
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(8)
+        self.port = self.server.getsockname()[1]
+        self.sessions = []
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+
+    def accept_loop(self):
+        while True:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+            self.sessions.append(sock)
+            threading.Thread(target=self.serve, args=(sock,), daemon=True).start()
+
+    def serve(self, sock):
+        reader = MessageReader(sock)
+        requests = []
+        try:
+            reader.read()  # hello
+            while True:
+                message = reader.read()
+                if message is None:
+                    return
+                requests.append(message)
+                if len(requests) == self.batch:
+                    for request in requests if self.in_order else reversed(requests):
+                        decision = "commit" if request["participants"] == ["1"] else "abort"
+                        send_message(sock, {"type": "result", "request": request["request"], "decision": decision})
+                    requests = []
+        except OSError:
+            pass
+
+    def close(self):
+        self.server.close()
+        for sock in self.sessions:
+            sock.close()
+
+
+class TransactionClientTest(unittest.TestCase):
+    """
+    Pipelining, cancellation and reconnection of the application client against a fake coordinator.
+    """
+
+    def start(self, batch, in_order=False):
+        coordinator = FakeCoordinator(batch, in_order)
+        self.addCleanup(coordinator.close)
+        client = TransactionClient(port=coordinator.port)
+        self.addCleanup(client.close)
+        return coordinator, client
+
+    def test_pipelined_results_resolve_their_own_futures(self):
+        _, client = self.start(batch=3)
+        futures = [client.begin(participants) for participants in (["1"], ["2"], ["1"])]
+        self.assertEqual([future.result(timeout=5) for future in futures], ["commit", "abort", "commit"])
+
+    def test_cancelled_future_does_not_break_the_connection(self):
+        _, client = self.start(batch=2, in_order=True)
+        cancelled = client.begin(["1"])
+        self.assertTrue(cancelled.cancel())
+        self.assertEqual(client.begin(["2"]).result(timeout=5), "abort")
+        self.assertFalse(client.pool[0].closed)
+
+    def test_wait_for_timeout_keeps_other_transactions_running(self):
+        _, client = self.start(batch=2, in_order=True)
+
+        async def run():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(client.begin_async(["1"]), 0.05)
+            return await client.begin_async(["2"])
+
+        self.assertEqual(asyncio.run(run()), "abort")
+
+    def test_lost_connection_fails_futures_and_is_replaced(self):
+        coordinator, client = self.start(batch=2)
+        future = client.begin(["1"])
+        coordinator.sessions[0].shutdown(socket.SHUT_RDWR)
+        with self.assertRaises(ConnectionError):
+            future.result(timeout=5)
+        lost = client.pool[0]
+        futures = [client.begin(["1"]), client.begin(["2"])]
+        self.assertIsNot(client.pool[0], lost)
+        self.assertEqual(lost.sock.fileno(), -1)
+        self.assertEqual([future.result(timeout=5) for future in futures], ["commit", "abort"])
+
+    def test_begin_requires_participants(self):
+        _, client = self.start(batch=1)
+        with self.assertRaises(ValueError):
+            client.begin([])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+import unittest
+
+from txn_log import TXID_TABLE_SLOTS, TransactionLog
+
+
+class TransactionLogTest(unittest.TestCase):
+    """
+    Recovery of the coordinator log with a good, stale or missing index and a torn tail.
+    """
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(prefix="2pc-test-"), "log.jsonl")
+        log = TransactionLog(self.path, checkpoint_every=4)
+        log.recover()
+        for i in range(6):
+            log.append({"clients": {"1": "prepared"}, "decision": "commit", "txid": f"1.{i}"})
+        for i in (0, 2, 4):
+            log.append({"txid": f"1.{i}", "done": True})
+        log.close()
+
+    def recover(self):
+        log = TransactionLog(self.path)
+        self.addCleanup(log.close)
+        return log, log.recover()
+
+    def test_good_index(self):
+        log, pending = self.recover()
+        self.assertEqual(sorted(pending), ["1.1", "1.3", "1.5"])
+        self.assertEqual(pending["1.3"]["decision"], "commit")
+        self.assertEqual(log.lookup("1.2"), "commit")
+        self.assertIsNone(log.lookup("1.9"))
+
+    def test_stale_index_replays_the_whole_log(self):
+        with open(self.path + ".idx") as file:
+            index = json.load(file)
+        # Point an in-doubt commit at the entry of another transaction
+        index["in_doubt"]["1.1"] = index["in_doubt"]["1.3"]
+        with open(self.path + ".idx", "w") as file:
+            json.dump(index, file)
+        log, pending = self.recover()
+        self.assertEqual(sorted(pending), ["1.1", "1.3", "1.5"])
+        self.assertEqual(pending["1.1"]["txid"], "1.1")
+
+    def test_index_of_another_log_is_not_trusted(self):
+        other = TransactionLog(os.path.join(os.path.dirname(self.path), "other.jsonl"))
+        other.recover()
+        other.append({"clients": {}, "decision": "commit", "txid": "2.0000"})
+        other.append({"txid": "2.0000", "done": True})
+        other.close()  # Its offset lands inside an entry of this log
+        for suffix in (".idx", ".txids"):
+            os.replace(other.path + suffix, self.path + suffix)
+        size = os.path.getsize(self.path)
+        log, pending = self.recover()
+        self.assertEqual(sorted(pending), ["1.1", "1.3", "1.5"])
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(log.lookup("1.0"), "commit")
+        self.assertIsNone(log.lookup("2.0000"))
+
+    def test_corrupt_entry_inside_the_log_is_skipped(self):
+        os.remove(self.path + ".idx")
+        with open(self.path, "r+b") as file:
+            file.write(b"#")  # Damage the first entry only
+        size = os.path.getsize(self.path)
+        log, pending = self.recover()
+        self.assertEqual(sorted(pending), ["1.1", "1.3", "1.5"])
+        self.assertEqual(os.path.getsize(self.path), size)
+
+    def test_missing_index_replays_the_whole_log(self):
+        os.remove(self.path + ".idx")
+        os.remove(self.path + ".txids")
+        log, pending = self.recover()
+        self.assertEqual(sorted(pending), ["1.1", "1.3", "1.5"])
+        self.assertEqual(log.lookup("1.0"), "commit")
+
+    def test_torn_tail_is_truncated(self):
+        size = os.path.getsize(self.path)
+        with open(self.path, "ab") as file:
+            file.write(b'{"clients": {"1": "prepared"}, "decision": "com')
+        log, pending = self.recover()
+        self.assertEqual(sorted(pending), ["1.1", "1.3", "1.5"])
+        self.assertEqual(os.path.getsize(self.path), size)
+        log.append({"clients": {"1": "prepared"}, "decision": "commit", "txid": "1.6"})
+        self.assertEqual(log.lookup("1.6"), "commit")
+
+    def test_tail_after_the_checkpoint_is_replayed(self):
+        log, _ = self.recover()
+        log.append({"clients": {"1": "prepared"}, "decision": "commit", "txid": "1.6"})
+        log.append({"txid": "1.1", "done": True})
+        log.file.close()  # Crash: the index still ends at the previous checkpoint
+        log, pending = self.recover()
+        self.assertEqual(sorted(pending), ["1.3", "1.5", "1.6"])
+        self.assertEqual(log.lookup("1.6"), "commit")
+
+    def test_lookup_after_the_txid_table_grows(self):
+        log, _ = self.recover()
+        for i in range(6, 1500):
+            log.append({"clients": {"1": "prepared"}, "decision": "commit", "txid": f"1.{i}"})
+        self.assertGreater(log.txids.capacity, TXID_TABLE_SLOTS)
+        log.close()
+        log, _ = self.recover()
+        self.assertEqual([log.lookup(f"1.{i}") for i in (0, 700, 1499)], ["commit"] * 3)
+        self.assertIsNone(log.lookup("1.1500"))
+
+    def test_slot_of_a_truncated_entry_is_ignored(self):
+        log, _ = self.recover()
+        size = os.path.getsize(self.path)
+        log.append({"clients": {"1": "prepared"}, "decision": "commit", "txid": "1.6"})
+        log.file.close()  # Crash before the next checkpoint
+        with open(self.path, "r+b") as file:
+            file.truncate(size + 10)  # The entry is torn, but its slot was already written
+        log, _ = self.recover()
+        self.assertIsNone(log.lookup("1.6"))
+        log.append({"clients": {"1": "prepared"}, "decision": "commit", "txid": "1.7"})
+        self.assertIsNone(log.lookup("1.6"))
+        self.assertEqual(log.lookup("1.7"), "commit")
+
+    def test_append_after_close_is_refused(self):
+        log, _ = self.recover()
+        log.close()
+        self.assertFalse(log.append({"txid": "1.1", "done": True}))
+        self.assertIsNone(log.lookup("1.1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
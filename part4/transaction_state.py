@@ -0,0 +1,138 @@
+import enum
+
+
+class TxState(enum.IntEnum):
+    """
+    Per-participant state of a transaction, stored as a single byte.
+    The string form is kept for the JSON log so existing logs stay readable.
+    """
+
+    CONNECTED = 0
+    PREPARED = 1
+    ABORTED = 2
+    COMMIT_SENT = 3
+    ABORT_SENT = 4
+
+    @classmethod
+    def from_status(cls, status):
+        """
+        Convert a status string from the log (e.g. "commit_sent") into a TxState.
+        """
+        return cls[status.upper()]
+
+    @property
+    def status(self):
+        """
+        Status string written to the log.
+        """
+        return self.name.lower()
+
+    @property
+    def sent(self):
+        """
+        True once the final decision has been delivered to the participant.
+        """
+        return self in (TxState.COMMIT_SENT, TxState.ABORT_SENT)
+
+
+SENT_STATE = {"commit": TxState.COMMIT_SENT, "abort": TxState.ABORT_SENT}
+
+
+class TransactionRecord:
+    """
+    Compact in-memory state of a single transaction.
+    Participant states live in a bytearray, and a prepared counter plus a pending bitmask
+    answer "did everyone vote yes" and "who still needs the decision" in O(1).
+    """
+
+    __slots__ = ("participants", "states", "prepared", "pending", "decision")
+
+    def __init__(self, participants=(), decision=None):
+        self.participants = []
+        self.states = bytearray()
+        self.prepared = 0  # Participants that voted yes
+        self.pending = 0  # Bit i set while participant i still needs the decision
+        self.decision = decision
+        for participant_id in participants:
+            self.add_participant(participant_id)
+
+    def add_participant(self, participant_id, state=TxState.CONNECTED):
+        """
+        Register a participant in the given state (CONNECTED by default).
+        """
+        slot = len(self.participants)
+        self.participants.append(participant_id)
+        self.states.append(TxState.CONNECTED)
+        self.pending |= 1 << slot
+        if state != TxState.CONNECTED:
+            self._move(slot, state)
+
+    def state_of(self, participant_id):
+        """
+        Return the TxState of a participant.
+        """
+        return TxState(self.states[self.participants.index(participant_id)])
+
+    def set_state(self, participant_id, state):
+        """
+        Update a participant's state, registering it first if it is new.
+        """
+        try:
+            slot = self.participants.index(participant_id)
+        except ValueError:
+            self.add_participant(participant_id, state)
+            return
+        self._move(slot, state)
+
+    def _move(self, slot, state):
+        """
+        Move the participant in the given slot to a new state, keeping counters in sync.
+        """
+        if self.states[slot] == TxState.PREPARED:
+            self.prepared -= 1
+        if state == TxState.PREPARED:
+            self.prepared += 1
+        if state.sent:
+            self.pending &= ~(1 << slot)
+        else:
+            self.pending |= 1 << slot
+        self.states[slot] = state
+
+    def all_prepared(self):
+        """
+        True if every participant voted yes.
+        """
+        return self.prepared == len(self.participants)
+
+    def mark_sent(self, participant_id):
+        """
+        Record that the final decision was delivered to a participant.
+        """
+        self.set_state(participant_id, SENT_STATE[self.decision])
+
+    def pending_participants(self):
+        """
+        Return the participants that have not yet received the decision, in join order.
+        """
+        pending = self.pending
+        return [participant_id for slot, participant_id in enumerate(self.participants) if pending >> slot & 1]
+
+    def to_log(self):
+        """
+        Serialize into the JSON log layout: {"clients": {id: status}, "decision": ...}.
+        """
+        clients = {
+            participant_id: TxState(state).status
+            for participant_id, state in zip(self.participants, self.states)
+        }
+        return {"clients": clients, "decision": self.decision}
+
+    @classmethod
+    def from_log(cls, log):
+        """
+        Rebuild a record from the JSON log layout produced by to_log.
+        """
+        record = cls(decision=log.get("decision"))
+        for participant_id, status in log.get("clients", {}).items():
+            record.add_participant(participant_id, TxState.from_status(status))
+        return record
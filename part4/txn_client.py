@@ -0,0 +1,144 @@
+import asyncio
+import itertools
+import socket
+import sys
+import threading
+from concurrent.futures import Future
+
+from protocol import MessageReader, send_message
+
+
+class Connection:
+    """
+    One application session to the coordinator.
+    Requests are pipelined: many transactions can be outstanding at once,
+    and a reader thread resolves each future when its result arrives.
+    """
+
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.send_lock = threading.Lock()
+        self.pending = {}  # request id -> Future
+        self.request_ids = itertools.count(1)
+        self.closed = False
+        send_message(self.sock, {"type": "hello", "role": "application"})
+        threading.Thread(target=self.read_results, daemon=True).start()
+
+    def submit(self, participants):
+        """
+        Send a 'begin' request and return a Future for its outcome.
+        """
+        future = Future()
+        with self.send_lock:
+            if self.closed:
+                raise ConnectionError("Connection to the coordinator is closed")
+            request_id = next(self.request_ids)
+            self.pending[request_id] = future
+            try:
+                send_message(self.sock, {"type": "begin", "request": request_id, "participants": participants})
+            except OSError:
+                del self.pending[request_id]
+                raise
+        return future
+
+    def read_results(self):
+        """
+        Resolve futures as results arrive; fail the rest if the connection drops.
+        Futures cancelled by the application (e.g. by asyncio.wait_for) are skipped.
+        """
+        reader = MessageReader(self.sock)
+        try:
+            while True:
+                message = reader.read()
+                if message is None:
+                    break
+                future = self.pending.pop(message.get("request"), None)
+                if future is not None and future.set_running_or_notify_cancel():
+                    future.set_result(message["decision"])
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self.send_lock:
+                self.closed = True
+                pending, self.pending = self.pending, {}
+            for future in pending.values():
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(ConnectionError("Connection to the coordinator was lost"))
+            self.sock.close()
+
+    def close(self):
+        """
+        Close the session; outstanding futures fail with ConnectionError.
+        """
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class TransactionClient:
+    """
+    Application-facing client for the Part 4 coordinator service.
+    Transactions are spread round-robin over a small pool of pipelined connections,
+    so many application threads can share it without a process per transaction.
+
+        client = TransactionClient(pool_size=2)
+        future = client.begin(["1", "2"])
+        print(future.result())  # 'commit' or 'abort'
+    """
+
+    def __init__(self, host="127.0.0.1", port=5000, pool_size=1):
+        self.host = host
+        self.port = port
+        self.lock = threading.Lock()
+        self.pool = [Connection(host, port) for _ in range(pool_size)]
+        self.next_connection = itertools.cycle(range(pool_size))
+
+    def begin(self, participants):
+        """
+        Start a transaction across the given participants.
+        Returns a concurrent.futures.Future resolving to 'commit' or 'abort'.
+        """
+        participants = [str(participant_id) for participant_id in participants]
+        if not participants:
+            raise ValueError("A transaction needs at least one participant")
+        with self.lock:
+            slot = next(self.next_connection)
+            connection = self.pool[slot]
+            if connection.closed:
+                # Replace a connection that was lost; its own futures have already failed
+                connection.close()
+                connection = self.pool[slot] = Connection(self.host, self.port)
+        return connection.submit(participants)
+
+    async def begin_async(self, participants):
+        """
+        Awaitable form of begin() for asyncio applications.
+        """
+        return await asyncio.wrap_future(self.begin(participants))
+
+    def close(self):
+        """
+        Close every pooled connection.
+        """
+        with self.lock:
+            for connection in self.pool:
+                connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python txn_client.py <participant_id> [<participant_id> ...]")
+        sys.exit(1)
+
+    with TransactionClient() as client:
+        decision = client.begin(sys.argv[1:]).result()
+        print(f"[Application] Transaction outcome: {decision}")
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+CHECKPOINT_EVERY = 10000  # Appended entries between index checkpoints
+TXID_TABLE_SLOTS = 1024  # Initial slots of the txid table, which doubles once half full
+HEADER = struct.Struct("<Q")  # Filled slots of the txid table
+SLOT = struct.Struct("<QQ")  # (hash of the txid, offset of its commit entry + 1); 0 marks an empty slot
+
+
+class TxidTable:
+    """
+    On-disk open-addressing hash table from txid to the offset of its commit entry,
+    probed and updated through mmap, so memory does not grow with the log.
+
+    Slots hold a 64-bit hash of the txid rather than the txid itself: a lookup returns
+    every offset stored under that hash, and the caller checks each against the log.
+    Callers must serialize access.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.view = None
+        self.capacity = 0
+        self.count = 0
+
+    def open(self, capacity=None):
+        """
+        Map the table, creating an empty one with the given capacity, or if the file
+        is missing or malformed.
+        """
+        if capacity is None:
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            capacity = (size - HEADER.size) // SLOT.size
+            if capacity < TXID_TABLE_SLOTS or capacity & (capacity - 1) or size != HEADER.size + capacity * SLOT.size:
+                capacity = TXID_TABLE_SLOTS
+            else:
+                capacity = None
+        if capacity is not None:
+            with open(self.path, "wb") as file:
+                file.truncate(HEADER.size + capacity * SLOT.size)
+        self.file = open(self.path, "r+b")
+        self.view = mmap.mmap(self.file.fileno(), 0)
+        self.capacity = (len(self.view) - HEADER.size) // SLOT.size
+        self.count = HEADER.unpack_from(self.view)[0]
+        if self.count >= self.capacity:
+            self.close()
+            self.open(TXID_TABLE_SLOTS)
+
+    def reset(self):
+        """
+        Replace the table with an empty one.
+        """
+        self.close()
+        self.open(TXID_TABLE_SLOTS)
+
+    @staticmethod
+    def key(txid):
+        return int.from_bytes(hashlib.blake2b(txid.encode(), digest_size=8).digest(), "little")
+
+    def probe(self, key):
+        """
+        Yield the position of every slot on the probe sequence of key.
+        """
+        mask = self.capacity - 1
+        for i in range(self.capacity):
+            yield HEADER.size + ((key + i) & mask) * SLOT.size
+
+    def insert(self, txid, offset):
+        """
+        Record the commit entry of txid at offset; re-inserting the same entry is a no-op,
+        so the tail replayed after a crash can be added again.
+        """
+        if (self.count + 1) * 2 > self.capacity:
+            self.grow()
+        self.place(self.key(txid), offset + 1)
+
+    def place(self, key, value):
+        for position in self.probe(key):
+            slot_key, slot_value = SLOT.unpack_from(self.view, position)
+            if not slot_value:
+                SLOT.pack_into(self.view, position, key, value)
+                self.count += 1
+                HEADER.pack_into(self.view, 0, self.count)
+                return
+            if slot_key == key and slot_value == value:
+                return
+
+    def find(self, txid):
+        """
+        Return the offsets stored under the hash of txid, which may include other transactions.
+        """
+        key = self.key(txid)
+        offsets = []
+        for position in self.probe(key):
+            slot_key, slot_value = SLOT.unpack_from(self.view, position)
+            if not slot_value:
+                break
+            if slot_key == key:
+                offsets.append(slot_value - 1)
+        return offsets
+
+    def grow(self):
+        """
+        Rehash into a table twice the size, written aside and swapped in atomically.
+        """
+        bigger = TxidTable(self.path + ".tmp")
+        bigger.open(self.capacity * 2)
+        for key, value in SLOT.iter_unpack(self.view[HEADER.size:]):
+            if value:
+                bigger.place(key, value)
+        bigger.flush()
+        bigger.close()
+        self.close()
+        os.replace(bigger.path, self.path)
+        self.open()
+
+    def flush(self):
+        self.view.flush()
+
+    def close(self):
+        if self.view is not None:
+            self.view.close()
+            self.file.close()
+            self.view = None
+
+
+class TransactionLog:
+    """
+    Append-only coordinator log (one JSON entry per line) with two sidecar files.
+
+    The index file (<log>.idx) records how far the log had been written and the byte
+    offset of every commit that was still waiting for acknowledgements at that point.
+    On startup only those entries and the tail written after the last checkpoint are
+    parsed, through mmap, so restart time no longer grows with the size of the log.
+
+    The txid table (<log>.txids) maps every commit to the offset of its entry, so lookup()
+    can seek straight to an old decision without holding all of them in memory.
+    """
+
+    def __init__(self, path, checkpoint_every=CHECKPOINT_EVERY):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.txids = TxidTable(path + ".txids")
+        self.checkpoint_every = checkpoint_every
+        self.lock = threading.Lock()
+        self.in_doubt = {}  # txid -> offset of its commit entry, until the commit is done
+        self.appended = 0
+        self.last_line = b""  # Last entry in the log, whose checksum ties the index to this log
+        self.file = None
+
+    def recover(self):
+        """
+        Return {txid: entry} for every commit that has no 'done' entry yet,
+        then open the log for appending and checkpoint the index, so the next
+        restart does not replay the same tail again.
+        """
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        self.txids.open()
+        offset, in_doubt, last_crc = self.read_index(size)
+        pending = {}
+        if size:
+            with open(self.path, "r+b") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    try:
+                        if offset:
+                            # The index must end on the entry it was checkpointed after
+                            start = view.rfind(b"\n", 0, offset - 1) + 1
+                            self.last_line = view[start:offset]
+                            if not self.last_line.endswith(b"\n") or zlib.crc32(self.last_line) != last_crc:
+                                raise ValueError(f"Index offset {offset} does not end an entry of this log")
+                        for txid, entry_offset in in_doubt.items():
+                            entry = self.read_entry(view, entry_offset)[0]
+                            if entry.get("txid") != txid or "decision" not in entry:
+                                raise ValueError(f"Index entry for {txid} points at {entry}")
+                            pending[txid] = entry
+                            self.in_doubt[txid] = entry_offset
+                    except ValueError:
+                        print("[Log] Index does not match the log; replaying the whole log.")
+                        offset = 0
+                        self.last_line = b""
+                        pending.clear()
+                        self.in_doubt.clear()
+                    if not offset:
+                        self.txids.reset()  # It may hold entries of another log
+                    end = self.replay(view, offset, pending)
+                if end < size:
+                    print(f"[Log] Truncating torn entry at offset {end}.")
+                    file.truncate(end)
+        else:
+            self.txids.reset()
+        self.file = open(self.path, "ab")
+        with self.lock:
+            self.write_index()
+        return pending
+
+    def read_index(self, size):
+        """
+        Load the sidecar index, falling back to a full replay if it or the txid table is missing or stale.
+        Returns (log offset, in-doubt commits, checksum of the last entry) as of the last checkpoint.
+        """
+        try:
+            with open(self.index_path, "r") as file:
+                index = json.load(file)
+            if index["offset"] <= size and index["txids"] <= self.txids.count:
+                return index["offset"], index["in_doubt"], index["last"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return 0, {}, 0
+
+    @staticmethod
+    def read_entry(view, offset):
+        """
+        Parse the entry starting at offset; return (entry, offset of the next entry).
+        Raises ValueError for a torn or missing entry.
+        """
+        end = view.find(b"\n", offset)
+        if end < 0:
+            raise ValueError(f"Incomplete entry at offset {offset}")
+        return json.loads(view[offset:end]), end + 1
+
+    def replay(self, view, offset, pending):
+        """
+        Apply the entries from offset to the end of the log; return where the valid log ends.
+        Only a final entry without a newline counts as torn; a corrupt entry followed by
+        others is skipped, so nothing after it is ever cut off.
+        """
+        size = len(view)
+        last = None
+        while offset < size:
+            try:
+                entry, next_offset = self.read_entry(view, offset)
+                txid = entry["txid"]
+            except (ValueError, KeyError, TypeError):
+                next_offset = view.find(b"\n", offset) + 1
+                if not next_offset:
+                    break  # Torn write at the end of the log
+                print(f"[Log] Skipping corrupt entry at offset {offset}.")
+                offset = next_offset
+                continue
+            last = offset, next_offset
+            if entry.get("done"):
+                pending.pop(txid, None)
+                self.in_doubt.pop(txid, None)
+            else:
+                pending[txid] = entry
+                self.in_doubt[txid] = offset
+                self.txids.insert(txid, offset)
+            offset = next_offset
+        if last:
+            self.last_line = view[last[0]:last[1]]
+        return offset
+
+    def append(self, entry, force=False):
+        """
+        Append an entry, forcing it to disk if requested.
+        Returns False without writing anything once the log has been closed.
+        """
+        line = (json.dumps(entry) + "\n").encode()
+        with self.lock:
+            if self.file.closed:
+                return False
+            offset = self.file.tell()
+            self.file.write(line)
+            self.file.flush()
+            self.last_line = line
+            if force:
+                os.fsync(self.file.fileno())
+            if entry.get("done"):
+                self.in_doubt.pop(entry["txid"], None)
+            else:
+                self.in_doubt[entry["txid"]] = offset
+                self.txids.insert(entry["txid"], offset)
+            self.appended += 1
+            if self.appended % self.checkpoint_every == 0:
+                self.write_index()
+        return True
+
+    def lookup(self, txid):
+        """
+        Return the logged decision of an old transaction, or None if it was never committed.
+        Candidate entries come from the txid table and are checked against the log itself,
+        so a hash collision or a slot left over from a truncated tail is skipped.
+        """
+        with self.lock:
+            if self.file.closed:
+                return None
+            offsets = self.txids.find(txid)
+        with open(self.path, "rb") as file:
+            for offset in offsets:
+                file.seek(offset)
+                try:
+                    entry = json.loads(file.readline())
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and entry.get("txid") == txid and "decision" in entry:
+                    return entry["decision"]
+        return None
+
+    def write_index(self):
+        """
+        Write the sidecar index atomically. Callers must hold the lock.
+        The txid table is forced first, as the index vouches for its contents.
+        """
+        self.txids.flush()
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"offset": self.file.tell(), "in_doubt": self.in_doubt,
+                       "txids": self.txids.count, "last": zlib.crc32(self.last_line)}, file)
+        os.replace(temp_path, self.index_path)
+
+    def close(self):
+        """
+        Checkpoint the index and close the log.
+        """
+        with self.lock:
+            if self.file and not self.file.closed:
+                self.write_index()
+                self.file.close()
+                self.txids.close()